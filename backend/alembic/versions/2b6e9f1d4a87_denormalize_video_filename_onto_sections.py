@@ -0,0 +1,67 @@
+"""Denormalize videos.filename onto sections.video_filename
+
+Revision ID: 2b6e9f1d4a87
+Revises: e4b7d2c9a615
+Create Date: 2026-10-15 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b6e9f1d4a87'
+down_revision = 'e4b7d2c9a615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sections', sa.Column('video_filename', sa.String(), nullable=True))
+    op.execute(
+        "UPDATE sections s SET video_filename = v.filename "
+        "FROM videos v WHERE s.video_id = v.id"
+    )
+
+    # New or re-pointed sections pick up the filename of their video
+    op.execute("""
+        CREATE FUNCTION sections_set_video_filename() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.video_id IS NULL THEN
+                NEW.video_filename := NULL;
+            ELSE
+                SELECT filename INTO NEW.video_filename FROM videos WHERE id = NEW.video_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_sections_video_filename
+        BEFORE INSERT OR UPDATE OF video_id ON sections
+        FOR EACH ROW EXECUTE FUNCTION sections_set_video_filename()
+    """)
+
+    # Renamed videos propagate to their sections
+    op.execute("""
+        CREATE FUNCTION videos_propagate_filename() RETURNS trigger AS $$
+        BEGIN
+            UPDATE sections SET video_filename = NEW.filename WHERE video_id = NEW.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_videos_filename
+        AFTER UPDATE OF filename ON videos
+        FOR EACH ROW WHEN (OLD.filename IS DISTINCT FROM NEW.filename)
+        EXECUTE FUNCTION videos_propagate_filename()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER trg_videos_filename ON videos")
+    op.execute("DROP FUNCTION videos_propagate_filename()")
+    op.execute("DROP TRIGGER trg_sections_video_filename ON sections")
+    op.execute("DROP FUNCTION sections_set_video_filename()")
+    op.drop_column('sections', 'video_filename')
@@ -0,0 +1,42 @@
+"""Replace ix_user_auth_email with a unique LOWER(email) covering index
+
+Revision ID: 3d9a6c1e7f48
+Revises: c6e1a9f4b258
+Create Date: 2026-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9a6c1e7f48'
+down_revision = 'c6e1a9f4b258'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fails if two existing accounts differ only in email case; merge them first.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_auth_email_lower',
+            'user_auth',
+            [sa.text('lower(email)')],
+            unique=True,
+            postgresql_include=['id', 'password_hash', 'created_at'],
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_user_auth_email', table_name='user_auth', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_auth_email',
+            'user_auth',
+            ['email'],
+            unique=True,
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_user_auth_email_lower', table_name='user_auth', postgresql_concurrently=True)
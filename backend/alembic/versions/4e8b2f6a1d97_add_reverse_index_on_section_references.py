@@ -0,0 +1,38 @@
+"""Add reverse index on section_references
+
+Revision ID: 4e8b2f6a1d97
+Revises: 9c41d7e2b8a3
+Create Date: 2026-10-15 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b2f6a1d97'
+down_revision = '9c41d7e2b8a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The primary key (section_id, reference_id) only serves section -> references;
+    # this index serves reference -> sections lookups (bibliography rendering).
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_section_references_ref_section',
+            'section_references',
+            ['reference_id', 'section_id'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_section_references_ref_section',
+            table_name='section_references',
+            postgresql_concurrently=True
+        )
@@ -0,0 +1,46 @@
+"""Denormalize book_id onto sections
+
+Revision ID: 7b3e9a1c5f20
+Revises: d2a7c5e9f310
+Create Date: 2026-10-15 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e9a1c5f20'
+down_revision = 'd2a7c5e9f310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Add as nullable, backfill from the parent chapter, then enforce NOT NULL
+    op.add_column('sections', sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.execute(
+        "UPDATE sections s SET book_id = c.book_id "
+        "FROM chapters c WHERE s.chapter_id = c.id"
+    )
+    op.alter_column('sections', 'book_id', nullable=False)
+    op.create_foreign_key(
+        'sections_book_id_fkey', 'sections', 'books',
+        ['book_id'], ['id'], ondelete='CASCADE'
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_sections_book',
+            'sections',
+            ['book_id', 'chapter_id', 'order'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_sections_book', table_name='sections', postgresql_concurrently=True)
+    op.drop_constraint('sections_book_id_fkey', 'sections', type_='foreignkey')
+    op.drop_column('sections', 'book_id')
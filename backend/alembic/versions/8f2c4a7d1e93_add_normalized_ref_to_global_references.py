@@ -0,0 +1,43 @@
+"""Add generated normalized_ref column to global_references
+
+Revision ID: 8f2c4a7d1e93
+Revises: 3d9a6c1e7f48
+Create Date: 2026-10-15 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2c4a7d1e93'
+down_revision = '3d9a6c1e7f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # STORED generated column: rewrites the table once
+    op.add_column(
+        'global_references',
+        sa.Column(
+            'normalized_ref',
+            sa.Text(),
+            sa.Computed(r"lower(btrim(regexp_replace(full_reference_abnt, '\s+', ' ', 'g')))", persisted=True),
+            nullable=True
+        )
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_global_references_book_normalized',
+            'global_references',
+            ['book_id', 'normalized_ref'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_global_references_book_normalized', table_name='global_references', postgresql_concurrently=True)
+    op.drop_column('global_references', 'normalized_ref')
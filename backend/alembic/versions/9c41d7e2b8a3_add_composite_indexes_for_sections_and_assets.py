@@ -0,0 +1,55 @@
+"""Add composite covering indexes for sections and section_assets
+
+Revision ID: 9c41d7e2b8a3
+Revises: 6a2f3e8d1c4b
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d7e2b8a3'
+down_revision = '6a2f3e8d1c4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        # Sections are always listed per chapter ordered by "order";
+        # INCLUDE makes the chapter listing an index-only scan
+        op.create_index(
+            'idx_sections_chapter_order',
+            'sections',
+            ['chapter_id', 'order'],
+            unique=False,
+            postgresql_include=['title', 'status'],
+            postgresql_concurrently=True
+        )
+        # Assets are fetched per section ordered by timestamp (video) or slide page
+        op.create_index(
+            'idx_section_assets_section_ts',
+            'section_assets',
+            ['section_id', 'timestamp'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'idx_section_assets_section_page',
+            'section_assets',
+            ['section_id', 'slide_page'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+    # idx_sections_status is kept: the content orchestrator still looks up
+    # the next PENDENTE section by status.
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_section_assets_section_page', table_name='section_assets', postgresql_concurrently=True)
+        op.drop_index('idx_section_assets_section_ts', table_name='section_assets', postgresql_concurrently=True)
+        op.drop_index('idx_sections_chapter_order', table_name='sections', postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""Add indexes on foreign key columns
+
+Revision ID: a8d4f2b6c913
+Revises: 5f1c8d3a7e62
+Create Date: 2026-10-15 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4f2b6c913'
+down_revision = '5f1c8d3a7e62'
+branch_labels = None
+depends_on = None
+
+
+# Postgres does not index referencing columns; without these, lookups by
+# parent and ON DELETE CASCADE / SET NULL scan the whole child table.
+FK_INDEXES = (
+    ('chapters', 'book_id'),
+    ('videos', 'book_id'),
+    ('transcriptions', 'book_id'),
+    ('slides', 'book_id'),
+    ('sections', 'video_id'),
+    ('sections', 'source_transcription_id'),
+    ('sections', 'source_slide_id'),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in FK_INDEXES:
+            op.create_index(
+                f'ix_{table}_{column}',
+                table,
+                [column],
+                unique=False,
+                postgresql_concurrently=True
+            )
+        op.create_index(
+            'idx_books_author_created',
+            'books',
+            ['author_profile_id', sa.text('created_at DESC')],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_books_author_created', table_name='books', postgresql_concurrently=True)
+        for table, column in reversed(FK_INDEXES):
+            op.drop_index(f'ix_{table}_{column}', table_name=table, postgresql_concurrently=True)
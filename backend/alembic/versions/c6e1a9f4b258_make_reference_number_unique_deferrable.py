@@ -0,0 +1,37 @@
+"""Make uq_book_reference_number deferrable
+
+Revision ID: c6e1a9f4b258
+Revises: a8d4f2b6c913
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e1a9f4b258'
+down_revision = 'a8d4f2b6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Checked at COMMIT, so reference numbers can be swapped in a single UPDATE
+    op.drop_constraint('uq_book_reference_number', 'global_references', type_='unique')
+    op.create_unique_constraint(
+        'uq_book_reference_number',
+        'global_references',
+        ['book_id', 'reference_number'],
+        deferrable=True,
+        initially='DEFERRED'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_book_reference_number', 'global_references', type_='unique')
+    op.create_unique_constraint(
+        'uq_book_reference_number',
+        'global_references',
+        ['book_id', 'reference_number']
+    )
@@ -0,0 +1,65 @@
+"""Convert status and source_type columns to native enums
+
+Revision ID: d2a7c5e9f310
+Revises: 4e8b2f6a1d97
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7c5e9f310'
+down_revision = '4e8b2f6a1d97'
+branch_labels = None
+depends_on = None
+
+
+book_status = sa.Enum(
+    'PENDING', 'PROCESSING', 'EXTRACTING_AUDIO', 'UPLOADING_TO_GEMINI',
+    'ANALYZING_CONTENT', 'GENERATING_STRUCTURE', 'DISCOVERY_COMPLETE',
+    'COMPLETED', 'ERROR', 'PROCESSANDO', 'ESTRUTURA_GERADA', 'CONCLUIDO', 'ERRO',
+    name='book_status'
+)
+section_status = sa.Enum(
+    'PENDING', 'PENDENTE', 'PROCESSANDO', 'SUCESSO', 'SUCCESS', 'ERRO', 'ERROR',
+    name='section_status'
+)
+asset_source_type = sa.Enum('SLIDE', 'VIDEO', 'MANUAL', name='asset_source_type')
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    book_status.create(bind, checkfirst=True)
+    section_status.create(bind, checkfirst=True)
+    asset_source_type.create(bind, checkfirst=True)
+
+    # Existing values must all belong to the enum domain; the cast fails otherwise
+    op.alter_column('books', 'status', type_=book_status,
+                    postgresql_using='status::book_status')
+    op.alter_column('sections', 'status', type_=section_status,
+                    postgresql_using='status::section_status')
+
+    # The text server default cannot be cast automatically; drop and re-add it
+    op.alter_column('section_assets', 'source_type', server_default=None)
+    op.alter_column('section_assets', 'source_type', type_=asset_source_type,
+                    postgresql_using='source_type::asset_source_type')
+    op.alter_column('section_assets', 'source_type', server_default='SLIDE')
+
+
+def downgrade() -> None:
+    op.alter_column('section_assets', 'source_type', server_default=None)
+    op.alter_column('section_assets', 'source_type', type_=sa.String(),
+                    postgresql_using='source_type::text')
+    op.alter_column('section_assets', 'source_type', server_default='SLIDE')
+
+    op.alter_column('sections', 'status', type_=sa.String(),
+                    postgresql_using='status::text')
+    op.alter_column('books', 'status', type_=sa.String(),
+                    postgresql_using='status::text')
+
+    bind = op.get_bind()
+    asset_source_type.drop(bind, checkfirst=True)
+    section_status.drop(bind, checkfirst=True)
+    book_status.drop(bind, checkfirst=True)
@@ -0,0 +1,45 @@
+"""Add idx_chapters_book_order and partial idx_sections_book_started
+
+Revision ID: e4b7d2c9a615
+Revises: 8f2c4a7d1e93
+Create Date: 2026-10-15 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7d2c9a615'
+down_revision = '8f2c4a7d1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # Returns a book's chapters already sorted; supersedes ix_chapters_book_id
+        op.create_index(
+            'idx_chapters_book_order',
+            'chapters',
+            ['book_id', 'order'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_chapters_book_id', table_name='chapters', postgresql_concurrently=True)
+        # Only sections past PENDENTE are indexed, used by the structure-edit guard
+        op.create_index(
+            'idx_sections_book_started',
+            'sections',
+            ['book_id'],
+            unique=False,
+            postgresql_where=sa.text("status <> 'PENDENTE'"),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_sections_book_started', table_name='sections', postgresql_concurrently=True)
+        op.create_index('ix_chapters_book_id', 'chapters', ['book_id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('idx_chapters_book_order', table_name='chapters', postgresql_concurrently=True)
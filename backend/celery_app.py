@@ -1,9 +1,13 @@
 """
 Celery Application Configuration
 """
-from celery import Celery
+from celery import Celery, Task, states
+from typing import Union
+from uuid import UUID
 import os
 
+from utils.cache import release_dispatch_lock
+
 celery_app = Celery(
     "video_to_book",
     broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
@@ -12,9 +16,33 @@ celery_app = Celery(
 )
 
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # msgpack keeps payloads compact and carries raw bytes (UUID.bytes ids);
+    # json is still accepted so messages queued before the switch drain cleanly
+    task_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_serializer="msgpack",
     timezone="America/Sao_Paulo",
     enable_utc=True,
 )
+
+
+def decode_task_id(value: Union[bytes, str]) -> str:
+    """
+    Normalize an id task argument to its canonical string form.
+    Producers send UUID.bytes (16 bytes); older messages carry the str form.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return str(UUID(bytes=bytes(value)))
+    return str(UUID(value))
+
+
+class DispatchLockedTask(Task):
+    """
+    Base for tasks whose API trigger takes a dispatch lock (utils.cache) keyed
+    on the task's first argument; the lock is released once the task returns.
+    A task that retries keeps it: the retry still owns the dispatch.
+    """
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        if args and status != states.RETRY:
+            release_dispatch_lock(self.name, decode_task_id(args[0]))
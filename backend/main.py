@@ -4,29 +4,46 @@ FastAPI Backend - Sistema de Transformação de Vídeo em Livro Didático
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import importlib
 import os
-from fastapi.staticfiles import StaticFiles
+import time
 
 from database import get_db, check_database_connection
-from routes.auth_routes import router as auth_router
-from routes.video_routes import router as video_router
-from routes.book_routes import router as book_router
-from routes.chapter_routes import router as chapter_router
-from routes.processing_routes import router as processing_router
-from routes.transcript_routes import router as transcript_router
-from routes.section_routes import router as section_router
-from routes.books_export_routes import router as books_export_router
-from routes.asset_routes import router as asset_router
-from routes.bibliography_routes import router as bibliography_router
+from utils.body_limit import BodySizeLimitMiddleware
+from utils.static_files import CachedStaticFiles
+
+# Router modules, in registration order; each exposes a `router` attribute
+ROUTER_MODULES = (
+    "routes.auth_routes",
+    "routes.video_routes",
+    "routes.book_routes",
+    "routes.chapter_routes",
+    "routes.processing_routes",
+    "routes.transcript_routes",
+    "routes.section_routes",
+    "routes.books_export_routes",
+    "routes.asset_routes",
+    "routes.bibliography_routes",
+)
+
+MEDIA_STORAGE_PATH = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
 
 app = FastAPI(
     title="Video to Book API",
     description="Sistema de transformação de vídeos educacionais em livros didáticos",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson encodes the (often large, deeply nested) chapter trees much faster
+    default_response_class=ORJSONResponse
 )
 
+# Reject oversized uploads from Content-Length before the body is read
+# (added before CORS so the 413 still carries CORS headers)
+app.add_middleware(BodySizeLimitMiddleware)
+
 # Configurar CORS para permitir requisições do frontend
 app.add_middleware(
     CORSMiddleware,
@@ -55,22 +72,22 @@ async def validation_exception_handler(request, exc):
         content={"detail": clean_errors},
     )
 
+def register_routers(app: FastAPI) -> None:
+    """
+    Import the router modules listed in ROUTER_MODULES and include them in the app.
+    Adding a router only requires adding its module path to the list.
+    """
+    for module_name in ROUTER_MODULES:
+        module = importlib.import_module(module_name)
+        app.include_router(module.router)
+
+
 # Include routers
-app.include_router(auth_router)
-app.include_router(video_router)
-app.include_router(book_router)
-app.include_router(chapter_router)
-app.include_router(processing_router)
-app.include_router(transcript_router)
-app.include_router(section_router)
-app.include_router(books_export_router)
-app.include_router(asset_router)
-app.include_router(bibliography_router)
+register_routers(app)
 
 # Mount media directory for serving extracted images
-media_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
-if os.path.exists(media_path):
-    app.mount("/media", StaticFiles(directory=media_path), name="media")
+if os.path.exists(MEDIA_STORAGE_PATH):
+    app.mount("/media", CachedStaticFiles(directory=MEDIA_STORAGE_PATH), name="media")
 
 @app.get("/")
 async def root():
@@ -78,13 +95,38 @@ async def root():
     return {
         "status": "online",
         "message": "Video to Book API is running",
-        "media_storage": os.getenv("MEDIA_STORAGE_PATH", "/app/media")
+        "media_storage": MEDIA_STORAGE_PATH
     }
 
+# Cached result of the last database check, shared by all /health probes
+_HEALTH_CACHE = {"ok": True, "ts": 0.0}
+_HEALTH_LOCK = asyncio.Lock()
+
+
+async def _cached_db_ok(ttl: float = 5.0) -> bool:
+    """
+    Return the database status, hitting the database at most once per `ttl` seconds.
+
+    Concurrent probes wait on the same lock, so a burst of requests after the
+    cache expires results in a single SELECT 1.
+    """
+    if time.monotonic() - _HEALTH_CACHE["ts"] < ttl:
+        return _HEALTH_CACHE["ok"]
+
+    async with _HEALTH_LOCK:
+        # Another probe may have refreshed the cache while we were waiting
+        if time.monotonic() - _HEALTH_CACHE["ts"] < ttl:
+            return _HEALTH_CACHE["ok"]
+
+        _HEALTH_CACHE["ok"] = await run_in_threadpool(check_database_connection)
+        _HEALTH_CACHE["ts"] = time.monotonic()
+        return _HEALTH_CACHE["ok"]
+
+
 @app.get("/health")
 async def health_check():
     """Verificação de saúde da aplicação"""
-    db_status = "connected" if check_database_connection() else "disconnected"
+    db_status = "connected" if await _cached_db_ok() else "disconnected"
     
     return {
         "status": "healthy" if db_status == "connected" else "unhealthy",
@@ -1,44 +1,68 @@
 """
 Books Model - Book information
 """
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import uuid
 
-from database import Base
+from database import Base, uuid7
+
+# Every status written by the video pipeline (English) and by the
+# transcript pipeline (Portuguese). Stored as the native `book_status` enum.
+BOOK_STATUSES = (
+    "PENDING",
+    "PROCESSING",
+    "EXTRACTING_AUDIO",
+    "UPLOADING_TO_GEMINI",
+    "ANALYZING_CONTENT",
+    "GENERATING_STRUCTURE",
+    "DISCOVERY_COMPLETE",
+    "COMPLETED",
+    "ERROR",
+    "PROCESSANDO",
+    "ESTRUTURA_GERADA",
+    "CONCLUIDO",
+    "ERRO",
+)
 
 
 class Books(Base):
     __tablename__ = "books"
+    # Fetch server defaults (e.g. created_at) via RETURNING instead of a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     author_profile_id = Column(UUID(as_uuid=True), ForeignKey("user_profiles.user_auth_id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=False)
     author = Column(String, nullable=False)
-    status = Column(String, nullable=False, default="PENDING")  # PENDING, PROCESSING, COMPLETED
+    status = Column(Enum(*BOOK_STATUSES, name="book_status"), nullable=False, default="PENDING")  # See BOOK_STATUSES
     processing_progress = Column(Integer, nullable=False, default=0)  # 0-100
     current_step = Column(String(50), nullable=True)  # Current processing step
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    # Serves "books of a user, newest first" (list_books) without a sort
+    __table_args__ = (
+        Index('idx_books_author_created', 'author_profile_id', created_at.desc()),
+    )
+
     # Relationship to UserProfiles (many-to-one)
     author_profile = relationship("UserProfiles", back_populates="books")
 
     # Relationship to Videos (one-to-many)
-    videos = relationship("Videos", back_populates="book", cascade="all, delete-orphan")
+    videos = relationship("Videos", back_populates="book", cascade="all, delete-orphan", passive_deletes=True)
 
     # Relationship to Chapters (one-to-many)
-    chapters = relationship("Chapters", back_populates="book", cascade="all, delete-orphan")
+    chapters = relationship("Chapters", back_populates="book", cascade="all, delete-orphan", passive_deletes=True, order_by="Chapters.order")
 
     # Relationship to Transcriptions (one-to-many)
-    transcriptions = relationship("Transcription", back_populates="book", cascade="all, delete-orphan")
+    transcriptions = relationship("Transcription", back_populates="book", cascade="all, delete-orphan", passive_deletes=True)
 
     # Relationship to Slides (one-to-many)
-    slides = relationship("Slide", back_populates="book", cascade="all, delete-orphan")
+    slides = relationship("Slide", back_populates="book", cascade="all, delete-orphan", passive_deletes=True)
 
     # Relationship to GlobalReferences (one-to-many)
-    global_references = relationship("GlobalReferences", back_populates="book", cascade="all, delete-orphan")
+    global_references = relationship("GlobalReferences", back_populates="book", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Books(id={self.id}, title={self.title}, status={self.status})>"
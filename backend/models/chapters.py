@@ -1,30 +1,35 @@
 """
 Chapters Model - Book chapters
 """
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import uuid
 
-from database import Base
+from database import Base, uuid7
 
 
 class Chapters(Base):
     __tablename__ = "chapters"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=False)
     order = Column(Integer, nullable=False)  # Sequential position in the book
     is_bibliography = Column(Boolean, nullable=False, default=False)  # Special bibliography chapter flag
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        # Chapters are always listed per book ordered by "order" (also covers the book_id FK)
+        Index('idx_chapters_book_order', 'book_id', 'order'),
+    )
+
     # Relationship to Books (many-to-one)
     book = relationship("Books", back_populates="chapters")
 
     # Relationship to Sections (one-to-many)
-    sections = relationship("Sections", back_populates="chapter", cascade="all, delete-orphan", order_by="Sections.order")
+    sections = relationship("Sections", back_populates="chapter", cascade="all, delete-orphan", passive_deletes=True, order_by="Sections.order")
 
     def __repr__(self):
         return f"<Chapters(id={self.id}, title={self.title}, order={self.order}, is_bibliography={self.is_bibliography})>"
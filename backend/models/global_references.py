@@ -1,22 +1,28 @@
 """
 GlobalReferences Model - Bibliography references with global numbering per book
 """
-from sqlalchemy import Column, String, Integer, Text, ForeignKey, UniqueConstraint, func
+from sqlalchemy import Column, Computed, Index, String, Integer, Text, ForeignKey, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 from sqlalchemy.orm import relationship
-import uuid
 
-from database import Base
+from database import Base, uuid7
 
 
 class GlobalReferences(Base):
     __tablename__ = "global_references"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
     reference_key = Column(String, nullable=False)  # Ex: "REF:SILVA_2022"
     reference_number = Column(Integer, nullable=False)  # Sequential numbering: 1, 2, 3...
     full_reference_abnt = Column(Text, nullable=False)  # ABNT formatted reference text
+    # Case/whitespace-insensitive form used to match edited bibliographies
+    # (mirrored in Python by bibliography_routes._normalize_reference)
+    normalized_ref = Column(
+        Text,
+        Computed(r"lower(btrim(regexp_replace(full_reference_abnt, '\s+', ' ', 'g')))", persisted=True)
+    )
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     # Relationship to Books (many-to-one)
@@ -26,13 +32,18 @@ class GlobalReferences(Base):
     sections = relationship(
         "Sections",
         secondary="section_references",
-        back_populates="references"
+        back_populates="references",
+        # section_references rows are removed by ON DELETE CASCADE
+        passive_deletes=True
     )
 
     # Constraints: ensure unique keys and numbers per book
     __table_args__ = (
         UniqueConstraint('book_id', 'reference_key', name='uq_book_reference_key'),
-        UniqueConstraint('book_id', 'reference_number', name='uq_book_reference_number'),
+        # Deferred so renumbering can swap numbers in a single UPDATE
+        UniqueConstraint('book_id', 'reference_number', name='uq_book_reference_number',
+                         deferrable=True, initially='DEFERRED'),
+        Index('idx_global_references_book_normalized', 'book_id', 'normalized_ref'),
     )
 
     def __repr__(self):
@@ -1,24 +1,26 @@
 """
 SectionAssets Model - Images extracted from video sections or slide PDFs
 """
-from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, Enum
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
-import uuid
 
-from database import Base
+from database import Base, uuid7
+
+# Stored as the native `asset_source_type` enum
+ASSET_SOURCE_TYPES = ("SLIDE", "VIDEO", "MANUAL")
 
 
 class SectionAssets(Base):
     __tablename__ = "section_assets"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     section_id = Column(UUID(as_uuid=True), ForeignKey("sections.id", ondelete="CASCADE"), nullable=False)
     placeholder = Column(String, nullable=False)  # e.g., "[IMAGE_1]"
     caption = Column(Text, nullable=True)  # AI-generated caption
     
-    # Source type: 'VIDEO' or 'SLIDE'
-    source_type = Column(String, nullable=False, default='SLIDE')
+    # Source type: 'VIDEO', 'SLIDE' or 'MANUAL'
+    source_type = Column(Enum(*ASSET_SOURCE_TYPES, name="asset_source_type"), nullable=False, default='SLIDE')
     
     # For VIDEO sources: timestamp in seconds
     timestamp = Column(Float, nullable=True)  # Exact second in the video (only for VIDEO type)
@@ -1,36 +1,61 @@
 """
 Sections Model - Chapter sections with video content mapping
 """
-from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, Table, Index, Enum, FetchedValue, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-import uuid
 
-from database import Base
+from database import Base, uuid7
+
+# Stored as the native `section_status` enum
+SECTION_STATUSES = (
+    "PENDING",
+    "PENDENTE",
+    "PROCESSANDO",
+    "SUCESSO",
+    "SUCCESS",
+    "ERRO",
+    "ERROR",
+)
 
 # Association table for many-to-many relationship between Sections and GlobalReferences
 section_references = Table(
     'section_references',
     Base.metadata,
     Column('section_id', UUID(as_uuid=True), ForeignKey('sections.id', ondelete='CASCADE'), primary_key=True),
-    Column('reference_id', UUID(as_uuid=True), ForeignKey('global_references.id', ondelete='CASCADE'), primary_key=True)
+    Column('reference_id', UUID(as_uuid=True), ForeignKey('global_references.id', ondelete='CASCADE'), primary_key=True),
+    # Reverse lookup (reference -> sections); the PK covers section -> references
+    Index('idx_section_references_ref_section', 'reference_id', 'section_id')
 )
 
 
 class Sections(Base):
     __tablename__ = "sections"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     chapter_id = Column(UUID(as_uuid=True), ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False)
-    video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="CASCADE"), nullable=True)
-    source_transcription_id = Column(UUID(as_uuid=True), ForeignKey("transcriptions.id", ondelete="SET NULL"), nullable=True)
-    source_slide_id = Column(UUID(as_uuid=True), ForeignKey("slides.id", ondelete="SET NULL"), nullable=True)
+    # Denormalized from chapters.book_id so book-wide queries skip the chapters join
+    book_id = Column(UUID(as_uuid=True), ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="CASCADE"), nullable=True, index=True)
+    source_transcription_id = Column(UUID(as_uuid=True), ForeignKey("transcriptions.id", ondelete="SET NULL"), nullable=True, index=True)
+    source_slide_id = Column(UUID(as_uuid=True), ForeignKey("slides.id", ondelete="SET NULL"), nullable=True, index=True)
+    # Denormalized copy of videos.filename, maintained by database triggers
+    # (see migration 2b6e9f1d4a87); never written by the application
+    video_filename = Column(String, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
     title = Column(String, nullable=False)
     order = Column(Integer, nullable=False)  # Sequential position within the chapter
     start_time = Column(Float, nullable=False)  # Timestamp in seconds
     end_time = Column(Float, nullable=False)  # Timestamp in seconds
     content_markdown = Column(Text, nullable=True)  # Generated content from Gemini 3.0 Pro
-    status = Column(String, nullable=False, default="PENDING")  # PENDING, SUCCESS, ERROR
+    status = Column(Enum(*SECTION_STATUSES, name="section_status"), nullable=False, default="PENDING")  # See SECTION_STATUSES
+
+    __table_args__ = (
+        Index('idx_sections_chapter_order', 'chapter_id', 'order', postgresql_include=['title', 'status']),
+        # Book-wide reads in reading order without joining chapters
+        Index('idx_sections_book', 'book_id', 'chapter_id', 'order'),
+        # Small partial index for "has this book started detailed processing?" checks
+        Index('idx_sections_book_started', 'book_id', postgresql_where=text("status <> 'PENDENTE'")),
+    )
 
     # Relationship to Chapters (many-to-one)
     chapter = relationship("Chapters", back_populates="sections")
@@ -45,13 +70,15 @@ class Sections(Base):
     slide = relationship("Slide")
 
     # Relationship to SectionAssets (one-to-many)
-    assets = relationship("SectionAssets", back_populates="section", cascade="all, delete-orphan", order_by="SectionAssets.slide_page")
+    assets = relationship("SectionAssets", back_populates="section", cascade="all, delete-orphan", passive_deletes=True, order_by="SectionAssets.slide_page")
 
     # Relationship to GlobalReferences (many-to-many)
     references = relationship(
         "GlobalReferences",
         secondary=section_references,
-        back_populates="sections"
+        back_populates="sections",
+        # section_references rows are removed by ON DELETE CASCADE
+        passive_deletes=True
     )
 
     def __repr__(self):
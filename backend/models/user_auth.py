@@ -1,25 +1,36 @@
 """
 UserAuth Model - Authentication credentials
 """
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import uuid
 
-from database import Base
+from database import Base, uuid7
 
 
 class UserAuth(Base):
     __tablename__ = "user_auth"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = Column(String, unique=True, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    email = Column(String, nullable=False)  # unique case-insensitively, see ix_user_auth_email_lower
     password_hash = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # Relationship to UserProfiles (one-to-one)
-    profile = relationship("UserProfiles", back_populates="user_auth", uselist=False, cascade="all, delete-orphan")
+    profile = relationship("UserProfiles", back_populates="user_auth", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Emails are looked up as LOWER(email) = LOWER(:email); INCLUDE lets the
+        # credential check read id/password_hash straight from the index
+        Index(
+            'ix_user_auth_email_lower',
+            func.lower(email),
+            unique=True,
+            postgresql_include=['id', 'password_hash', 'created_at']
+        ),
+    )
 
     def __repr__(self):
         return f"<UserAuth(id={self.id}, email={self.email})>"
@@ -19,7 +19,7 @@ class UserProfiles(Base):
     user_auth = relationship("UserAuth", back_populates="profile")
 
     # Relationship to Books (one-to-many)
-    books = relationship("Books", back_populates="author_profile", cascade="all, delete-orphan")
+    books = relationship("Books", back_populates="author_profile", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<UserProfiles(user_auth_id={self.user_auth_id}, full_name={self.full_name})>"
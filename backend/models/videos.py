@@ -5,16 +5,16 @@ from sqlalchemy import Column, String, Float, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import uuid
 
-from database import Base
+from database import Base, uuid7
 
 
 class Videos(Base):
     __tablename__ = "videos"
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    book_id = Column(UUID(as_uuid=True), ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    book_id = Column(UUID(as_uuid=True), ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
     storage_path = Column(String, nullable=False)
     duration = Column(Float, nullable=False)  # Duration in seconds
     filename = Column(String, nullable=False)
@@ -24,7 +24,7 @@ class Videos(Base):
     book = relationship("Books", back_populates="videos")
 
     # Relationship to Sections (one-to-many)
-    sections = relationship("Sections", back_populates="video", cascade="all, delete-orphan")
+    sections = relationship("Sections", back_populates="video", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Videos(id={self.id}, filename={self.filename}, duration={self.duration})>"
@@ -2,23 +2,45 @@
 Asset Routes - API endpoints for managing section assets (images)
 """
 import os
-import shutil
+import re
 import uuid
+from functools import lru_cache
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import Integer, cast, func
 from uuid import UUID
 
-from database import get_db
+from database import get_db, uuid7
 from models.section_assets import SectionAssets
 from models.sections import Sections
 from models.chapters import Chapters
 from models.books import Books
 from security import get_current_user
-from routes.chapter_routes import verify_book_ownership
+from utils.file_utils import save_upload, remove_file
 
 router = APIRouter(prefix="/assets", tags=["assets"])
 
+# Loads section -> chapter -> book in the same SELECT (all FKs are NOT NULL,
+# so inner joins are safe and compatible with FOR UPDATE)
+SECTION_WITH_BOOK = joinedload(Sections.chapter, innerjoin=True).joinedload(Chapters.book, innerjoin=True)
+
+
+@lru_cache(maxsize=256)
+def _placeholder_block_re(placeholder: str) -> "re.Pattern[str]":
+    """Pattern matching a placeholder and its surrounding blank lines (cached per placeholder)."""
+    return re.compile(r'\n*\s*' + re.escape(placeholder) + r'\s*\n*')
+
+
+def verify_owner(book: Books, user_id: str) -> None:
+    """Raise 403 if the already loaded book does not belong to the user."""
+    if str(book.author_profile_id) != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Você não tem permissão para acessar este livro"
+        )
+
 @router.post("/{section_id}")
 async def upload_manual_asset(
     section_id: UUID,
@@ -32,14 +54,20 @@ async def upload_manual_asset(
     """
     user_id = current_user["id"]
     
-    # Verify section and ownership
-    section = db.query(Sections).filter(Sections.id == section_id).first()
+    # Verify section and ownership. The row lock serializes concurrent uploads
+    # to the same section so they cannot compute the same IMAGE_N.
+    section = (
+        db.query(Sections)
+        .options(SECTION_WITH_BOOK)
+        .filter(Sections.id == section_id)
+        .with_for_update(of=Sections)
+        .first()
+    )
     if not section:
         raise HTTPException(status_code=404, detail="Seção não encontrada")
     
-    chapter = section.chapter
-    book = chapter.book
-    verify_book_ownership(book.id, user_id, db)
+    book = section.chapter.book
+    verify_owner(book, user_id)
     
     # Check status (optional, but keep consistent with structure updates)
     if section.status == "PROCESSANDO":
@@ -48,14 +76,10 @@ async def upload_manual_asset(
             detail="Não é possível adicionar imagens enquanto a seção está sendo processada."
         )
 
-    # Calculate next placeholder
-    existing_assets = db.query(SectionAssets).filter(SectionAssets.section_id == section_id).all()
-    max_n = 0
-    import re
-    for asset in existing_assets:
-        match = re.search(r'\[IMAGE_(\d+)\]', asset.placeholder)
-        if match:
-            max_n = max(max_n, int(match.group(1)))
+    # Calculate next placeholder (highest IMAGE_N computed by Postgres)
+    max_n = db.query(
+        func.max(cast(func.substring(SectionAssets.placeholder, r'\[IMAGE_(\d+)\]'), Integer))
+    ).filter(SectionAssets.section_id == section_id).scalar() or 0
     
     new_n = max_n + 1
     placeholder = f"[IMAGE_{new_n}]"
@@ -63,17 +87,17 @@ async def upload_manual_asset(
     # Save file
     media_root = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
     upload_dir = os.path.join(media_root, str(user_id), str(book.id), "extracted_images", str(section_id))
-    os.makedirs(upload_dir, exist_ok=True)
     
     file_extension = os.path.splitext(file.filename)[1] or ".png"
     safe_filename = f"manual_{new_n}{file_extension}"
     file_path = os.path.join(upload_dir, safe_filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Blocking disk IO (mkdir + copy) runs in the threadpool, not on the event loop
+    await run_in_threadpool(save_upload, file.file, file_path)
     
     # Create DB entry
     new_asset = SectionAssets(
+        id=uuid7(),
         section_id=section_id,
         placeholder=placeholder,
         caption=caption,
@@ -91,10 +115,8 @@ async def upload_manual_asset(
     else:
         section.content_markdown = f"\n\n{placeholder}\n\n"
     
-    db.commit()
-    db.refresh(new_asset)
-    
-    return {
+    # Every returned value was set here (id included), so no refresh is needed
+    response = {
         "message": "Imagem enviada com sucesso",
         "asset": {
             "id": new_asset.id,
@@ -103,6 +125,9 @@ async def upload_manual_asset(
             "storage_path": new_asset.storage_path
         }
     }
+    db.commit()
+    
+    return response
 
 @router.put("/{asset_id}")
 async def update_asset(
@@ -113,12 +138,17 @@ async def update_asset(
     db: Session = Depends(get_db)
 ):
     """Update metadata (caption) or replace the image file of an asset"""
-    asset = db.query(SectionAssets).filter(SectionAssets.id == asset_id).first()
+    asset = (
+        db.query(SectionAssets)
+        .options(joinedload(SectionAssets.section, innerjoin=True).options(SECTION_WITH_BOOK))
+        .filter(SectionAssets.id == asset_id)
+        .first()
+    )
     if not asset:
         raise HTTPException(status_code=404, detail="Recurso não encontrado")
     
     section = asset.section
-    verify_book_ownership(section.chapter.book_id, current_user["id"], db)
+    verify_owner(section.chapter.book, current_user["id"])
     
     if caption is not None:
         asset.caption = caption
@@ -129,7 +159,6 @@ async def update_asset(
         
         # We reuse the directory and filename logic from upload
         upload_dir = os.path.dirname(old_path)
-        os.makedirs(upload_dir, exist_ok=True)
         
         # To avoid caching issues and be safe, we can generate a new unique name 
         # or just overwrite. Overwriting might be better to keep the same name,
@@ -138,18 +167,16 @@ async def update_asset(
         new_filename = f"replaced_{uuid.uuid4().hex[:8]}{file_extension}"
         new_path = os.path.join(upload_dir, new_filename)
         
-        with open(new_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(save_upload, file.file, new_path)
             
         # Update path in DB
         asset.storage_path = new_path
         
         # Delete old file
-        if os.path.exists(old_path):
-            try:
-                os.remove(old_path)
-            except Exception as e:
-                print(f"Error deleting old file during replacement: {e}")
+        try:
+            await run_in_threadpool(remove_file, old_path)
+        except OSError as e:
+            print(f"Error deleting old file during replacement: {e}")
 
     db.commit()
     return {
@@ -165,29 +192,32 @@ async def delete_asset(
     db: Session = Depends(get_db)
 ):
     """Delete an asset and remove its placeholder from markdown"""
-    asset = db.query(SectionAssets).filter(SectionAssets.id == asset_id).first()
+    asset = (
+        db.query(SectionAssets)
+        .options(joinedload(SectionAssets.section, innerjoin=True).options(SECTION_WITH_BOOK))
+        .filter(SectionAssets.id == asset_id)
+        .first()
+    )
     if not asset:
         raise HTTPException(status_code=404, detail="Recurso não encontrado")
     
     section = asset.section
-    verify_book_ownership(section.chapter.book_id, current_user["id"], db)
+    verify_owner(section.chapter.book, current_user["id"])
     
     placeholder = asset.placeholder
     file_path = asset.storage_path
     
     # Remove from markdown
     if section.content_markdown:
-        import re
         # Pattern to find the placeholder and surrounding blank lines
-        pattern = re.compile(r'\n*\s*' + re.escape(placeholder) + r'\s*\n*')
+        pattern = _placeholder_block_re(placeholder)
         section.content_markdown = pattern.sub('\n\n', section.content_markdown).strip()
     
     # Delete file if it exists
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-        except Exception as e:
-            print(f"Error deleting file: {e}")
+    try:
+        await run_in_threadpool(remove_file, file_path)
+    except OSError as e:
+        print(f"Error deleting file: {e}")
             
     # Delete from DB
     db.delete(asset)
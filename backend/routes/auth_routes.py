@@ -2,11 +2,13 @@
 Authentication Routes - User registration and login endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, insert, literal, select
+from starlette.concurrency import run_in_threadpool
 import os
 
-from database import get_db
+from database import get_db, uuid7
 from models.user_auth import UserAuth
 from models.user_profiles import UserProfiles
 from schemas.auth_schemas import (
@@ -16,6 +18,7 @@ from schemas.auth_schemas import (
     UserResponse
 )
 from security import hash_password, verify_password, create_access_token
+from utils.file_utils import ensure_dir
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -40,7 +43,7 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
         HTTPException 400: Invalid input data
     """
     # Check if email already exists
-    existing_user = db.query(UserAuth).filter(UserAuth.email == request.email).first()
+    existing_user = db.query(UserAuth.id).filter(func.lower(UserAuth.email) == func.lower(request.email)).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -48,40 +51,42 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
         )
     
     try:
-        # Create UserAuth with hashed password
-        password_hashed = hash_password(request.password)
-        user_auth = UserAuth(
-            email=request.email,
-            password_hash=password_hashed
+        # Create UserAuth and the linked UserProfiles in a single statement:
+        # WITH new_user AS (INSERT INTO user_auth ... RETURNING id)
+        # INSERT INTO user_profiles (user_auth_id, full_name) SELECT id, :name FROM new_user
+        # The id is generated here, so no refresh is needed afterwards.
+        # bcrypt is CPU-bound (and releases the GIL): hash in the threadpool, not on the event loop
+        password_hashed = await run_in_threadpool(hash_password, request.password)
+        user_id = uuid7()
+        new_user = (
+            insert(UserAuth)
+            .values(id=user_id, email=request.email, password_hash=password_hashed)
+            .returning(UserAuth.id)
+            .cte("new_user")
         )
-        db.add(user_auth)
-        db.flush()  # Flush to get the generated ID
-        
-        # Create UserProfiles linked to UserAuth
-        user_profile = UserProfiles(
-            user_auth_id=user_auth.id,
-            full_name=request.full_name
+        db.execute(
+            insert(UserProfiles).from_select(
+                ["user_auth_id", "full_name"],
+                select(new_user.c.id, literal(request.full_name))
+            )
         )
-        db.add(user_profile)
         db.commit()
-        db.refresh(user_auth)
-        db.refresh(user_profile)
         
         # Create user folder in media_storage
         media_storage_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
-        user_folder = os.path.join(media_storage_path, str(user_auth.id))
-        os.makedirs(user_folder, exist_ok=True)
+        user_folder = os.path.join(media_storage_path, str(user_id))
+        await run_in_threadpool(ensure_dir, user_folder)
         
         # Generate JWT token
         access_token = create_access_token(
-            data={"sub": str(user_auth.id), "email": user_auth.email}
+            data={"sub": str(user_id), "email": request.email}
         )
         
         # Prepare response
         user_data = UserResponse(
-            id=user_auth.id,
-            email=user_auth.email,
-            full_name=user_profile.full_name
+            id=user_id,
+            email=request.email,
+            full_name=request.full_name
         )
         
         return AuthResponse(
@@ -121,8 +126,13 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
     Raises:
         HTTPException 401: Invalid credentials
     """
-    # Find user by email
-    user_auth = db.query(UserAuth).filter(UserAuth.email == request.email).first()
+    # Find user by email, loading the profile in the same query
+    user_auth = (
+        db.query(UserAuth)
+        .options(joinedload(UserAuth.profile))
+        .filter(func.lower(UserAuth.email) == func.lower(request.email))
+        .first()
+    )
     
     if not user_auth:
         raise HTTPException(
@@ -131,16 +141,15 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(request.password, user_auth.password_hash):
+    # bcrypt is CPU-bound: verify in the threadpool so other requests keep being served
+    if not await run_in_threadpool(verify_password, request.password, user_auth.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="E-mail ou senha incorretos"
         )
     
-    # Get user profile
-    user_profile = db.query(UserProfiles).filter(
-        UserProfiles.user_auth_id == user_auth.id
-    ).first()
+    # Get user profile (already loaded)
+    user_profile = user_auth.profile
     
     if not user_profile:
         raise HTTPException(
@@ -3,57 +3,77 @@ Bibliography Routes - API endpoints for managing bibliography chapter
 """
 import re
 import logging
+from functools import lru_cache
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from sqlalchemy import Integer, Text, column, delete, func, insert, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from typing import Dict, Tuple
 from uuid import UUID
 
-from database import get_db
+from database import get_db, uuid7
 from models.chapters import Chapters
 from models.sections import Sections
 from models.global_references import GlobalReferences
 from schemas.chapter_schemas import BibliographyUpdate, BibliographyUpdateResponse
-from security import get_current_user
+from security import BookHeader, get_owned_book
 
 router = APIRouter(prefix="/books", tags=["bibliography"])
 logger = logging.getLogger(__name__)
 
-
-def _verify_book_ownership(book_id: UUID, user_id: str, db: Session):
-    from models.books import Books
-    book = db.query(Books).filter(Books.id == book_id).first()
-    if not book:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Livro não encontrado")
-    if str(book.author_profile_id) != user_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado")
-    return book
-
-
 def _parse_bibliography_markdown(markdown: str) -> Dict[int, str]:
     """
     Parse bibliography markdown into a dict: {reference_number: full_reference_text}.
     Expects lines like: [1] SILVA, João. Título. Editora, 2022.
     """
-    pattern = re.compile(r"^\[(\d+)\]\s+(.+)$", re.MULTILINE)
     result = {}
-    for match in pattern.finditer(markdown):
-        num = int(match.group(1))
-        text = match.group(2).strip()
-        result[num] = text
+    for line in markdown.splitlines():
+        if not line.startswith("["):
+            continue
+        end = line.find("]")
+        number = line[1:end]
+        # ASCII digits only, followed by whitespace before the reference text
+        if end < 2 or not (number.isascii() and number.isdigit()) or not line[end + 1:end + 2].isspace():
+            continue
+        result[int(number)] = line[end + 1:].strip()
     return result
 
 
-def _replace_citations_in_markdown(markdown: str, old_num: int, temp_marker: str) -> str:
-    """Replace [old_num] citation with a temp marker to avoid cascading replacements."""
-    # Match [N] but not [IMAGE_N] or similar
-    return re.sub(rf"(?<!\w)\[{old_num}\](?!\w)", temp_marker, markdown)
+# Postgres' \s: ASCII whitespace only (str.split() would also collapse NBSP & co.)
+_SQL_WHITESPACE_RE = re.compile(r"[ \t\n\r\f\v]+")
+
+
+def _normalize_reference(text: str) -> str:
+    """
+    Python mirror of the global_references.normalized_ref generated column:
+    lower(btrim(regexp_replace(full_reference_abnt, '\\s+', ' ', 'g'))).
+    """
+    return _SQL_WHITESPACE_RE.sub(" ", text).strip(" ").lower()
+
+
+@lru_cache(maxsize=128)
+def _build_citation_pattern(numbers: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    Compile one alternation regex matching every citation number in `numbers`,
+    e.g. [1], [3] or [5] (but not [IMAGE_N] or similar). Cached per number set.
+    """
+    alternation = "|".join(re.escape(num) for num in numbers)
+    return re.compile(rf"(?<!\w)\[({alternation})\](?!\w)")
+
+
+def _replace_citations_in_markdown(markdown: str, pattern: "re.Pattern[str]", citation_map: Dict[str, str]) -> str:
+    """
+    Rewrite all citations in a single scan. All replacements happen at once,
+    so swapped numbers (e.g. 1 <-> 2) cannot cascade into each other.
+    """
+    return pattern.sub(lambda m: citation_map[m.group(1)], markdown)
 
 
 @router.put("/{book_id}/bibliography", response_model=BibliographyUpdateResponse)
 async def update_bibliography(
     book_id: UUID,
     update_data: BibliographyUpdate,
-    current_user: dict = Depends(get_current_user),
+    book: BookHeader = Depends(get_owned_book),
     db: Session = Depends(get_db)
 ):
     """
@@ -66,9 +86,9 @@ async def update_bibliography(
     4. Removes references that were deleted from the markdown (and cleans citations from all sections).
     5. Updates all section markdowns to reflect renumbering.
     6. Saves the new bibliography markdown content.
+
+    Only the book owner can access this endpoint (get_owned_book).
     """
-    user_id = current_user["id"]
-    _verify_book_ownership(book_id, user_id, db)
 
     # 1. Parse the submitted markdown
     submitted = _parse_bibliography_markdown(update_data.content_markdown)
@@ -78,153 +98,192 @@ async def update_bibliography(
             detail="Nenhuma referência encontrada no markdown. Formato esperado: [1] Texto da referência..."
         )
 
-    # 2. Fetch all current references from DB
-    current_refs: List[GlobalReferences] = db.query(GlobalReferences).filter(
-        GlobalReferences.book_id == book_id
-    ).order_by(GlobalReferences.reference_number.asc()).all()
-
-    # Build lookup: number -> ref object
-    current_by_number: Dict[int, GlobalReferences] = {r.reference_number: r for r in current_refs}
-
-    # 3. Determine which old reference keys map to new numbers
-    # Strategy: match by text similarity OR position (if user reordered)
-    # Build reverse lookup: ref_text -> old_number
-    old_text_to_number: Dict[str, int] = {r.full_reference_abnt: r.reference_number for r in current_refs}
-
-    # Map: old_number -> new_number (for renumbering citations in sections)
-    renumber_map: Dict[int, int] = {}
-
-    # Track which old refs are being kept/updated (by old number)
-    kept_old_numbers = set()
-
-    # For each entry in submitted markdown
-    for new_num, new_text in submitted.items():
-        # Try to find the matching existing ref by text
-        if new_text in old_text_to_number:
-            old_num = old_text_to_number[new_text]
-            kept_old_numbers.add(old_num)
-            if old_num != new_num:
-                renumber_map[old_num] = new_num
-        else:
+    with db.no_autoflush:
+        # 2. Fetch id + number of all current references (index-only on the
+        # (book_id, reference_number) unique index)
+        current_by_number = {
+            r.reference_number: r.id
+            for r in db.execute(
+                select(GlobalReferences.id, GlobalReferences.reference_number)
+                .where(GlobalReferences.book_id == book_id)
+            )
+        }
+
+        # 3. Determine which old reference keys map to new numbers
+        # Strategy: match by normalized text OR position (if user reordered)
+        # Build reverse lookup: normalized_ref -> old_number, probing the
+        # (book_id, normalized_ref) index only for the submitted texts
+        normalized_submitted = {num: _normalize_reference(text) for num, text in submitted.items()}
+        old_text_to_number: Dict[str, int] = dict(db.execute(
+            select(GlobalReferences.normalized_ref, GlobalReferences.reference_number)
+            .where(
+                GlobalReferences.book_id == book_id,
+                GlobalReferences.normalized_ref.in_(set(normalized_submitted.values()))
+            )
+        ).all())
+
+        # Map: old_number -> new_number (for renumbering citations in sections)
+        renumber_map: Dict[int, int] = {}
+
+        # Track which old refs are being kept/updated (by old number)
+        kept_old_numbers = set()
+
+        # id -> text for every kept reference; only rows whose text actually
+        # changed (e.g. case or spacing edits) are written
+        text_updates: Dict[UUID, str] = {}
+        new_refs = []
+
+        # For each entry in submitted markdown
+        for new_num, new_text in submitted.items():
+            normalized = normalized_submitted[new_num]
+            # Try to find the matching existing ref by text
+            if normalized in old_text_to_number:
+                old_num = old_text_to_number[normalized]
+                kept_old_numbers.add(old_num)
+                text_updates[current_by_number[old_num]] = new_text
+                if old_num != new_num:
+                    renumber_map[old_num] = new_num
             # New reference text (not previously in DB): check if there's a ref with this number to update
-            if new_num in current_by_number:
-                old_ref = current_by_number[new_num]
-                kept_old_numbers.add(old_num := old_ref.reference_number)
+            elif new_num in current_by_number:
+                kept_old_numbers.add(new_num)
                 # Text changed, update it
-                old_ref.full_reference_abnt = new_text
+                text_updates[current_by_number[new_num]] = new_text
             # If neither exists, this is a brand new reference — add it
             else:
-                new_ref = GlobalReferences(
-                    book_id=book_id,
-                    reference_key=f"REF:MANUAL_{new_num}",
-                    reference_number=new_num,
-                    full_reference_abnt=new_text
+                new_refs.append({
+                    "id": uuid7(),
+                    "book_id": book_id,
+                    "reference_key": f"REF:MANUAL_{new_num}",
+                    "reference_number": new_num,
+                    "full_reference_abnt": new_text
+                })
+
+        # 4. Find deleted references (old numbers NOT present in submitted).
+        # section_references rows go with them through ON DELETE CASCADE.
+        deleted_old_numbers = set(current_by_number.keys()) - kept_old_numbers
+        if deleted_old_numbers:
+            db.execute(
+                delete(GlobalReferences).where(
+                    GlobalReferences.id.in_([current_by_number[n] for n in deleted_old_numbers])
+                ),
+                execution_options={"synchronize_session": False}
+            )
+            logger.info(f"Deleted references {sorted(deleted_old_numbers)} from book {book_id}")
+
+        if text_updates:
+            texts = values(
+                column("id", PG_UUID(as_uuid=True)),
+                column("text", Text),
+                name="t"
+            ).data(list(text_updates.items()))
+            db.execute(
+                update(GlobalReferences)
+                .where(
+                    GlobalReferences.id == texts.c.id,
+                    GlobalReferences.full_reference_abnt.is_distinct_from(texts.c.text)
                 )
-                db.add(new_ref)
-                kept_old_numbers.add(new_num)
-
-    # 4. Find deleted references (old numbers NOT present in submitted)
-    deleted_old_numbers = set(current_by_number.keys()) - kept_old_numbers
-    for old_num in deleted_old_numbers:
-        ref = current_by_number[old_num]
-        db.delete(ref)
-        logger.info(f"Deleted reference [{old_num}] from book {book_id}")
-
-    db.flush()  # Apply deletes and text updates before renumbering
-
-    # 5. Apply renumbering on DB
-    # Use temporary negative numbers to avoid unique constraint violations during swap
-    for old_num, new_num in renumber_map.items():
-        if old_num in current_by_number:
-            ref = current_by_number[old_num]
-            ref.reference_number = -(new_num)  # temp negative
-    db.flush()
-
-    for old_num, new_num in renumber_map.items():
-        if old_num in current_by_number:
-            ref = current_by_number[old_num]
-            ref.reference_number = new_num  # finalize
-    db.flush()
-
-    # 6. Update citations in all content sections
-    # Collect all non-bibliography sections of this book
-    non_bib_sections: List[Sections] = (
-        db.query(Sections)
-        .join(Chapters)
-        .filter(
-            Chapters.book_id == book_id,
-            Chapters.is_bibliography == False
-        )
-        .all()
-    )
-
-    sections_affected = 0
-
-    if renumber_map or deleted_old_numbers:
-        for section in non_bib_sections:
-            if not section.content_markdown:
-                continue
-
-            original = section.content_markdown
-            modified = original
-
-            # Step A: Replace old numbers with temp markers (avoid cascading)
-            temp_markers = {}
-            for old_num, new_num in renumber_map.items():
-                marker = f"[__BIBREF_{old_num}__]"
-                temp_markers[marker] = new_num
-                modified = _replace_citations_in_markdown(modified, old_num, marker)
-
-            # Step B: Remove deleted citations (replace with empty string)
-            for old_num in deleted_old_numbers:
-                modified = re.sub(rf"(?<!\w)\[{old_num}\](?!\w)", "", modified)
-
-            # Step C: Replace temp markers with new numbers
-            for marker, new_num in temp_markers.items():
-                modified = modified.replace(marker, f"[{new_num}]")
-
-            if modified != original:
-                section.content_markdown = modified
-                sections_affected += 1
-
-    # 7. Update the bibliography chapter section with new content
-    bib_chapter = db.query(Chapters).filter(
-        Chapters.book_id == book_id,
-        Chapters.is_bibliography == True
-    ).first()
-
-    if bib_chapter:
-        bib_section = db.query(Sections).filter(
-            Sections.chapter_id == bib_chapter.id
-        ).first()
-        if bib_section:
-            bib_section.content_markdown = update_data.content_markdown
-    else:
-        # No bibliography chapter yet — create it
-        from sqlalchemy import func as sqlfunc
-        max_order = db.query(sqlfunc.max(Chapters.order)).filter(
-            Chapters.book_id == book_id
-        ).scalar() or 0
-
-        bib_chapter = Chapters(
-            book_id=book_id,
-            title="Referências",
-            order=max_order + 1,
-            is_bibliography=True
-        )
-        db.add(bib_chapter)
-        db.flush()
-
-        new_bib_section = Sections(
-            chapter_id=bib_chapter.id,
-            title="Lista de Referências",
-            order=1,
-            start_time=0.0,
-            end_time=0.0,
-            content_markdown=update_data.content_markdown,
-            status="SUCESSO"
-        )
-        db.add(new_bib_section)
+                .values(full_reference_abnt=texts.c.text),
+                execution_options={"synchronize_session": False}
+            )
+
+        # 5. Apply renumbering on DB in one statement:
+        # UPDATE ... FROM (VALUES (id, new_num), ...). uq_book_reference_number is
+        # DEFERRABLE INITIALLY DEFERRED, so swaps are only validated at COMMIT.
+        renumber_rows = [
+            (current_by_number[old_num], new_num)
+            for old_num, new_num in renumber_map.items()
+        ]
+        if renumber_rows:
+            mapping = values(
+                column("id", PG_UUID(as_uuid=True)),
+                column("new_num", Integer),
+                name="m"
+            ).data(renumber_rows)
+            db.execute(
+                update(GlobalReferences)
+                .where(GlobalReferences.id == mapping.c.id)
+                .values(reference_number=mapping.c.new_num),
+                execution_options={"synchronize_session": False}
+            )
+
+        if new_refs:
+            db.execute(insert(GlobalReferences), new_refs)
+
+        # 6. Update citations in all content sections
+        sections_affected = 0
+
+        if renumber_map or deleted_old_numbers:
+            # Final mapping old citation -> replacement ("" removes deleted citations)
+            citation_map: Dict[str, str] = {str(old_num): f"[{new_num}]" for old_num, new_num in renumber_map.items()}
+            citation_map.update({str(old_num): "" for old_num in deleted_old_numbers})
+            citation_pattern = _build_citation_pattern(tuple(sorted(citation_map)))
+
+            # Load only id + markdown of the non-bibliography sections of this book
+            non_bib_sections = db.execute(
+                select(Sections.id, Sections.content_markdown)
+                .join(Chapters)
+                .where(
+                    Sections.book_id == book_id,
+                    Chapters.is_bibliography == False,
+                    Sections.content_markdown.is_not(None)
+                )
+            ).all()
+
+            payload = []
+            for section_id, original in non_bib_sections:
+                modified = _replace_citations_in_markdown(original, citation_pattern, citation_map)
+                if modified != original:
+                    payload.append({"id": section_id, "content_markdown": modified})
+
+            # Single executemany UPDATE keyed by primary key, only for changed sections
+            if payload:
+                db.execute(update(Sections), payload)
+            sections_affected = len(payload)
+
+        # 7. Update the bibliography chapter section with new content
+        bib_chapter_id = db.execute(
+            select(Chapters.id).where(
+                Chapters.book_id == book_id,
+                Chapters.is_bibliography == True
+            ).limit(1)
+        ).scalar()
+
+        if bib_chapter_id is not None:
+            bib_section_id = db.execute(
+                select(Sections.id).where(Sections.chapter_id == bib_chapter_id).limit(1)
+            ).scalar()
+            if bib_section_id is not None:
+                db.execute(
+                    update(Sections)
+                    .where(Sections.id == bib_section_id)
+                    .values(content_markdown=update_data.content_markdown),
+                    execution_options={"synchronize_session": False}
+                )
+        else:
+            # No bibliography chapter yet — create it. The chapter id is generated
+            # here so the section can reference it without an intermediate flush.
+            max_order = db.execute(
+                select(func.max(Chapters.order)).where(Chapters.book_id == book_id)
+            ).scalar() or 0
+
+            bib_chapter = Chapters(
+                id=uuid7(),
+                book_id=book_id,
+                title="Referências",
+                order=max_order + 1,
+                is_bibliography=True
+            )
+            new_bib_section = Sections(
+                chapter_id=bib_chapter.id,
+                book_id=book_id,
+                title="Lista de Referências",
+                order=1,
+                start_time=0.0,
+                end_time=0.0,
+                content_markdown=update_data.content_markdown,
+                status="SUCESSO"
+            )
+            db.add_all([bib_chapter, new_bib_section])
 
     db.commit()
 
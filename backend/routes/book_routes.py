@@ -3,19 +3,21 @@ Book Routes - API endpoints for book management
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, select
 from typing import List
 from uuid import UUID
 import os
-import shutil
 
-from database import get_db
+from database import get_db, get_async_db
 from models.books import Books
 from models.videos import Videos
 from models.user_profiles import UserProfiles
 from schemas.book_schemas import BookCreate, BookResponse, BookDetailResponse
-from security import get_current_user
+from security import get_current_user, load_owned_book
 from utils.status_translator import translate_status
+from utils.file_utils import ensure_dir, remove_tree
 
 router = APIRouter(prefix="/books", tags=["books"])
 
@@ -53,7 +55,7 @@ def verify_book_ownership(book_id: UUID, user_id: UUID, db: Session) -> Books:
 @router.get("", response_model=List[BookResponse])
 async def list_books(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     List all books belonging to the authenticated user.
@@ -61,18 +63,28 @@ async def list_books(
     """
     user_id = current_user["id"]
     
-    # Query books with video count
+    # Count videos per book in a subquery limited to this user's books, so the
+    # outer query needs no GROUP BY over every Books column.
+    video_counts = (
+        select(Videos.book_id, func.count().label("video_count"))
+        .where(Videos.book_id.in_(
+            select(Books.id).where(Books.author_profile_id == user_id)
+        ))
+        .group_by(Videos.book_id)
+        .subquery()
+    )
+    
     books_with_count = (
-        db.query(
-            Books,
-            func.count(Videos.id).label("video_count")
+        await db.execute(
+            select(
+                Books,
+                func.coalesce(video_counts.c.video_count, 0)
+            )
+            .outerjoin(video_counts, Books.id == video_counts.c.book_id)
+            .filter(Books.author_profile_id == user_id)
+            .order_by(Books.created_at.desc())
         )
-        .outerjoin(Videos, Books.id == Videos.book_id)
-        .filter(Books.author_profile_id == user_id)
-        .group_by(Books.id)
-        .order_by(Books.created_at.desc())
-        .all()
-    )
+    ).all()
     
     # Format response
     result = []
@@ -124,19 +136,10 @@ async def create_book(
     )
     
     db.add(new_book)
-    db.commit()
-    db.refresh(new_book)
-    
-    # Create book folder in media_storage/{user_id}/{book_id}/uploads
-    media_storage_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
-    # Base book folder
-    book_folder = os.path.join(media_storage_path, str(user_id), str(new_book.id))
-    # Uploads subfolder
-    uploads_folder = os.path.join(book_folder, "uploads")
-    
-    os.makedirs(uploads_folder, exist_ok=True)
-    
-    return BookResponse(
+    # The flush's INSERT ... RETURNING fills created_at (eager_defaults), so the
+    # response is built from the pending object and no refresh is needed
+    db.flush()
+    response = BookResponse(
         id=new_book.id,
         title=new_book.title,
         author=new_book.author,
@@ -147,6 +150,18 @@ async def create_book(
         created_at=new_book.created_at,
         video_count=0
     )
+    db.commit()
+    
+    # Create book folder in media_storage/{user_id}/{book_id}/uploads
+    media_storage_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
+    # Base book folder
+    book_folder = os.path.join(media_storage_path, str(user_id), str(response.id))
+    # Uploads subfolder
+    uploads_folder = os.path.join(book_folder, "uploads")
+    
+    await run_in_threadpool(ensure_dir, uploads_folder)
+    
+    return response
 
 
 @router.get("/{book_id}", response_model=BookDetailResponse)
@@ -205,25 +220,24 @@ async def delete_book(
     """
     user_id = current_user["id"]
     
-    # Verify ownership
-    book = verify_book_ownership(book_id, user_id, db)
+    # Verify ownership (narrow id/status lookup, no ORM object loaded)
+    load_owned_book(book_id, user_id, db)
     
     # Get book folder path before deletion
     media_storage_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
     book_folder = os.path.join(media_storage_path, str(user_id), str(book_id))
     
-    # Delete book from database (cascade will handle related records)
-    db.delete(book)
+    # Delete book from database (ON DELETE CASCADE handles related records)
+    db.execute(delete(Books).where(Books.id == book_id))
     db.commit()
     
-    # Clean up media files from disk
-    import shutil
-    if os.path.exists(book_folder):
-        try:
-            shutil.rmtree(book_folder)
-        except Exception as e:
-            # Log error but don't fail the request since DB deletion succeeded
-            print(f"Warning: Failed to delete media folder {book_folder}: {str(e)}")
+    # Clean up media files from disk (thousands of unlinks for a large book,
+    # so run them in the threadpool instead of on the event loop)
+    try:
+        await run_in_threadpool(remove_tree, book_folder)
+    except Exception as e:
+        # Log error but don't fail the request since DB deletion succeeded
+        print(f"Warning: Failed to delete media folder {book_folder}: {str(e)}")
     
     return {
         "success": True,
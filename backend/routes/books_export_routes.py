@@ -2,42 +2,60 @@
 Book Export Routes - Endpoint for PDF generation and download.
 """
 
-import re
+import tempfile
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
 from database import get_db
 from services.pdf_service import generate_book_pdf
 
 router = APIRouter(prefix="/books", tags=["books-export"])
 
+# PDFs up to this size stay in memory; larger ones spill to a temp file
+PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Characters that are invalid in file names, deleted via str.translate
+_INVALID_FILENAME_CHARS = str.maketrans("", "", '\\/*?:"<>|')
+
 
 def _sanitize_filename(name: str) -> str:
     """Remove caracteres inválidos para nomes de arquivo."""
-    clean = re.sub(r'[\\/*?:"<>|]', "", name)
-    return clean.strip() or "ebook"
+    return name.translate(_INVALID_FILENAME_CHARS).strip() or "ebook"
 
 
 @router.get("/{book_id}/export/pdf")
 async def export_book_pdf(
     book_id: UUID,
     db: Session = Depends(get_db),
-) -> Response:
+) -> StreamingResponse:
     """
     Gera e retorna o PDF completo do livro.
     Erros 404 (livro inexistente) e 409 (seções incompletas)
     propagam naturalmente via HTTPException do service.
     """
-    pdf_bytes, book_title = generate_book_pdf(book_id, db)
+    buffer = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    try:
+        # ReportLab rendering is CPU-bound and blocking: keep it off the event loop
+        book_title = await run_in_threadpool(generate_book_pdf, book_id, db, buffer)
+    except BaseException:
+        buffer.close()
+        raise
     safe_title = _sanitize_filename(book_title)
+    size = buffer.tell()
+    buffer.seek(0)
 
-    return Response(
-        content=pdf_bytes,
+    return StreamingResponse(
+        iter(lambda: buffer.read(PDF_STREAM_CHUNK_SIZE), b""),
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f'attachment; filename="{safe_title}.pdf"'
+            "Content-Disposition": f'attachment; filename="{safe_title}.pdf"',
+            "Content-Length": str(size),
         },
+        background=BackgroundTask(buffer.close),
     )
@@ -1,101 +1,125 @@
 """
 Chapter Routes - API endpoints for chapter and section management
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, raiseload, selectinload
+from typing import List, Optional
 from uuid import UUID
 
 from database import get_db
 from models.chapters import Chapters
 from models.sections import Sections
 from models.books import Books
-from models.videos import Videos
-from schemas.chapter_schemas import ChapterResponse, SectionResponse, ChapterUpdate, SectionUpdate, BookStructureUpdate
-from security import get_current_user
+from schemas.chapter_schemas import ChapterListAdapter, ChapterResponse, SectionAssetResponse, SectionResponse, ChapterUpdate, SectionUpdate, BookStructureUpdate
+from security import BookHeader, get_current_user, get_owned_book
 
 router = APIRouter(prefix="/books", tags=["chapters"])
 
+# Sections with their assets, one SELECT ... WHERE id IN (...) per path
+# (the video filename is denormalized onto sections, so videos are not loaded).
+# raiseload("*") on every level turns any other relationship access into an
+# error instead of a silent per-row lazy load.
+CHAPTER_SECTIONS = selectinload(Chapters.sections)
+CHAPTER_SECTIONS_FULL = (
+    CHAPTER_SECTIONS.selectinload(Sections.assets).raiseload("*"),
+    CHAPTER_SECTIONS.raiseload("*"),
+    raiseload("*"),
+)
 
-def verify_book_ownership(book_id: UUID, user_id: str, db: Session) -> Books:
-    """
-    Verify that the book belongs to the authenticated user.
-    Returns the book if ownership is valid, raises 404/403 otherwise.
-    """
-    book = db.query(Books).filter(Books.id == book_id).first()
-    
-    if not book:
+
+def _check_owner(owner_id: Optional[UUID], user_id: str) -> None:
+    if owner_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Livro não encontrado"
         )
     
-    if str(book.author_profile_id) != user_id:
+    if str(owner_id) != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Você não tem permissão para acessar este livro"
         )
-    
-    return book
+
+
+def _section_response(section: Sections) -> SectionResponse:
+    """
+    Build a SectionResponse from a loaded section without re-validating it.
+    Values come straight from the database, so model_construct is safe here.
+    """
+    return SectionResponse.model_construct(
+        id=section.id,
+        chapter_id=section.chapter_id,
+        video_id=section.video_id,
+        title=section.title,
+        order=section.order,
+        start_time=section.start_time,
+        end_time=section.end_time,
+        content_markdown=section.content_markdown,
+        status=section.status,
+        video_filename=section.video_filename,
+        assets=[
+            SectionAssetResponse.model_construct(
+                id=asset.id,
+                placeholder=asset.placeholder,
+                caption=asset.caption,
+                source_type=asset.source_type,
+                storage_path=asset.storage_path,
+                slide_page=asset.slide_page,
+                crop_info=asset.crop_info
+            )
+            for asset in section.assets
+        ]
+    )
+
+
+def _chapter_response(chapter: Chapters) -> ChapterResponse:
+    """
+    Build a ChapterResponse (with its sections) without re-validating it.
+    """
+    return ChapterResponse.model_construct(
+        id=chapter.id,
+        book_id=chapter.book_id,
+        title=chapter.title,
+        order=chapter.order,
+        is_bibliography=chapter.is_bibliography,
+        created_at=chapter.created_at,
+        sections=[_section_response(section) for section in chapter.sections]
+    )
 
 
 @router.get("/{book_id}/chapters", response_model=List[ChapterResponse])
 async def get_book_chapters(
     book_id: UUID,
-    current_user: dict = Depends(get_current_user),
+    book: BookHeader = Depends(get_owned_book),
     db: Session = Depends(get_db)
 ):
     """
     Get all chapters and sections for a specific book.
     
     Returns chapters ordered by 'order' field, with nested sections also ordered.
-    Only the book owner can access this endpoint.
-    """
-    user_id = current_user["id"]
-    
-    # Verify ownership
-    verify_book_ownership(book_id, user_id, db)
+    Only the book owner can access this endpoint (get_owned_book).
     
+    The output is NOT validated against ChapterResponse: the models are built
+    with model_construct from database rows (_chapter_response) and written
+    straight to JSON bytes by ChapterListAdapter, bypassing FastAPI's response
+    validation and the app's default ORJSONResponse. response_model only
+    documents the shape, so a schema change must be mirrored in
+    _chapter_response / _section_response by hand.
+    """
     # Get all chapters for this book, ordered
-    chapters = db.query(Chapters).filter(
-        Chapters.book_id == book_id
-    ).order_by(Chapters.order).all()
+    chapters = db.execute(
+        select(Chapters)
+        .options(*CHAPTER_SECTIONS_FULL)
+        .where(Chapters.book_id == book_id)
+        .order_by(Chapters.order)
+    ).scalars().all()
     
-    # Build response with sections
-    result = []
-    for chapter in chapters:
-        # Get sections for this chapter with video info
-        sections_data = []
-        for section in chapter.sections:
-            # Get video filename
-            video = db.query(Videos).filter(Videos.id == section.video_id).first()
-            video_filename = video.filename if video else None
-            
-            sections_data.append(SectionResponse(
-                id=section.id,
-                chapter_id=section.chapter_id,
-                video_id=section.video_id,
-                title=section.title,
-                order=section.order,
-                start_time=section.start_time,
-                end_time=section.end_time,
-                content_markdown=section.content_markdown,
-                status=section.status,
-                video_filename=video_filename,
-                assets=section.assets
-            ))
-        
-        result.append(ChapterResponse(
-            id=chapter.id,
-            book_id=chapter.book_id,
-            title=chapter.title,
-            order=chapter.order,
-            is_bibliography=chapter.is_bibliography,
-            created_at=chapter.created_at,
-            sections=sections_data
-        ))
-    
-    return result
+    # Serialized directly (unvalidated, see docstring)
+    return Response(
+        content=ChapterListAdapter.dump_json([_chapter_response(chapter) for chapter in chapters]),
+        media_type="application/json"
+    )
 
 
 @router.put("/chapters/{chapter_id}", response_model=ChapterResponse)
@@ -112,51 +136,30 @@ async def update_chapter(
     """
     user_id = current_user["id"]
     
-    # Get chapter
-    chapter = db.query(Chapters).filter(Chapters.id == chapter_id).first()
-    if not chapter:
+    # Get chapter together with its book's owner in one query
+    row = db.query(Chapters, Books.author_profile_id).join(
+        Books, Chapters.book_id == Books.id
+    ).filter(Chapters.id == chapter_id).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Capítulo não encontrado"
         )
+    chapter, owner_id = row
     
     # Verify book ownership
-    verify_book_ownership(chapter.book_id, user_id, db)
+    _check_owner(owner_id, user_id)
     
     # Update title
     chapter.title = update_data.title
     db.commit()
-    db.refresh(chapter)
     
-    # Build response with sections
-    sections_data = []
-    for section in chapter.sections:
-        video = db.query(Videos).filter(Videos.id == section.video_id).first()
-        video_filename = video.filename if video else None
-        
-        sections_data.append(SectionResponse(
-            id=section.id,
-            chapter_id=section.chapter_id,
-            video_id=section.video_id,
-            title=section.title,
-            order=section.order,
-            start_time=section.start_time,
-            end_time=section.end_time,
-            content_markdown=section.content_markdown,
-            status=section.status,
-            video_filename=video_filename,
-            assets=section.assets
-        ))
+    # Reload with sections, videos and assets in a constant number of queries
+    chapter = db.query(Chapters).options(*CHAPTER_SECTIONS_FULL).populate_existing().filter(
+        Chapters.id == chapter_id
+    ).one()
     
-    return ChapterResponse(
-        id=chapter.id,
-        book_id=chapter.book_id,
-        title=chapter.title,
-        order=chapter.order,
-        is_bibliography=chapter.is_bibliography,
-        created_at=chapter.created_at,
-        sections=sections_data
-    )
+    return _chapter_response(chapter)
 
 
 @router.put("/sections/{section_id}", response_model=SectionResponse)
@@ -173,24 +176,23 @@ async def update_section(
     """
     user_id = current_user["id"]
     
-    # Get section
-    section = db.query(Sections).filter(Sections.id == section_id).first()
-    if not section:
+    # Get section and its book's owner in one query
+    # (sections.book_id and video_filename are denormalized, so neither the
+    # chapters nor the videos join is needed)
+    row = db.query(Sections, Books.author_profile_id).join(
+        Books, Sections.book_id == Books.id
+    ).options(
+        selectinload(Sections.assets)
+    ).filter(Sections.id == section_id).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Seção não encontrada"
         )
-    
-    # Get chapter to verify book ownership
-    chapter = db.query(Chapters).filter(Chapters.id == section.chapter_id).first()
-    if not chapter:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Capítulo não encontrado"
-        )
+    section, owner_id = row
     
     # Verify book ownership
-    verify_book_ownership(chapter.book_id, user_id, db)
+    _check_owner(owner_id, user_id)
     
     # Update fields if provided
     if update_data.title is not None:
@@ -198,83 +200,79 @@ async def update_section(
     if update_data.content_markdown is not None:
         section.content_markdown = update_data.content_markdown
     
-    db.commit()
-    db.refresh(section)
+    # Build the response from the loaded row before commit expires it,
+    # so no refresh or extra lookups are needed afterwards
+    response = _section_response(section)
     
-    # Get video filename
-    video = db.query(Videos).filter(Videos.id == section.video_id).first()
-    video_filename = video.filename if video else None
+    db.commit()
     
-    return SectionResponse(
-        id=section.id,
-        chapter_id=section.chapter_id,
-        video_id=section.video_id,
-        title=section.title,
-        order=section.order,
-        start_time=section.start_time,
-        end_time=section.end_time,
-        content_markdown=section.content_markdown,
-        status=section.status,
-        video_filename=video_filename,
-        assets=section.assets
-    )
+    return response
 
 
 @router.put("/{book_id}/structure")
 async def update_book_structure(
     book_id: UUID,
     structure: BookStructureUpdate,
-    current_user: dict = Depends(get_current_user),
+    book: BookHeader = Depends(get_owned_book),
     db: Session = Depends(get_db)
 ):
     """
     Bulk update the structure of a book (chapter orders, section orders, and chapter associations).
+    Only the book owner can access this endpoint (get_owned_book).
     """
-    user_id = current_user["id"]
-    
-    # Verify book ownership
-    verify_book_ownership(book_id, user_id, db)
-    
     # Check if book is already being processed (optional, but good for safety)
-    book = db.query(Books).filter(Books.id == book_id).first()
     # If any section is not PENDING, we might want to block structure changes 
     # to avoid mess with already generated content.
     # However, the user explicitly asked for this check in the frontend.
     # Let's add it here too for security.
-    processing_sections = db.query(Sections).join(Chapters).filter(
-        Chapters.book_id == book_id,
-        ~Sections.status.in_(["PENDENTE", "ESTRUTURA_GERADA"])
-    ).count()
+    # EXISTS stops at the first started section (idx_sections_book_started)
+    has_started_sections = db.query(
+        db.query(Sections.id).filter(
+            Sections.book_id == book_id,
+            Sections.status != "PENDENTE"
+        ).exists()
+    ).scalar()
     
-    if processing_sections > 0:
+    if has_started_sections:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Não é possível alterar a estrutura após o início do processamento detalhado."
         )
 
-    # 1. Update Chapter orders
-    for chap_data in structure.chapters:
-        chapter = db.query(Chapters).filter(
-            Chapters.id == chap_data.id,
-            Chapters.book_id == book_id
-        ).first()
-        
-        if chapter:
-            chapter.order = chap_data.order
-            
-            # 2. Update Section orders and chapter associations
-            for sec_data in chap_data.sections:
-                section = db.query(Sections).filter(Sections.id == sec_data.id).first()
-                if section:
-                    # Verify the section belongs to a chapter of THIS book
-                    dest_chapter = db.query(Chapters).filter(
-                        Chapters.id == sec_data.chapter_id,
-                        Chapters.book_id == book_id
-                    ).first()
-                    
-                    if dest_chapter:
-                        section.order = sec_data.order
-                        section.chapter_id = sec_data.chapter_id
+    # Prefetch the ids that belong to this book (two queries total)
+    book_chapter_ids = set(db.execute(
+        select(Chapters.id).where(Chapters.book_id == book_id)
+    ).scalars())
+    requested_section_ids = [sec.id for chap in structure.chapters for sec in chap.sections]
+    book_section_ids = set(db.execute(
+        select(Sections.id).where(
+            Sections.book_id == book_id,
+            Sections.id.in_(requested_section_ids)
+        )
+    ).scalars()) if requested_section_ids else set()
+
+    # 1. Chapter orders
+    chapter_updates = [
+        {"id": chap_data.id, "order": chap_data.order}
+        for chap_data in structure.chapters
+        if chap_data.id in book_chapter_ids
+    ]
+
+    # 2. Section orders and chapter associations; the destination chapter
+    # must also belong to THIS book
+    section_updates = [
+        {"id": sec_data.id, "order": sec_data.order, "chapter_id": sec_data.chapter_id}
+        for chap_data in structure.chapters
+        if chap_data.id in book_chapter_ids
+        for sec_data in chap_data.sections
+        if sec_data.id in book_section_ids and sec_data.chapter_id in book_chapter_ids
+    ]
+
+    # One executemany UPDATE per table, keyed by primary key
+    if chapter_updates:
+        db.execute(update(Chapters), chapter_updates)
+    if section_updates:
+        db.execute(update(Sections), section_updates)
     
     db.commit()
     return {"message": "Estrutura atualizada com sucesso"}
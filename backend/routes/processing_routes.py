@@ -2,12 +2,15 @@
 Processing Routes - API endpoints for video processing
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from uuid import UUID
 
 from database import get_db
 from models.books import Books
-from security import get_current_user
+from security import BookHeader, get_current_user, get_owned_book
+from utils.cache import acquire_dispatch_lock, release_dispatch_lock
 from tasks.video_processing import process_book_videos
 from tasks.transcript_tasks import process_book_transcripts_task, process_book_content_sequential_task
 from models.transcriptions import Transcription
@@ -16,6 +19,25 @@ from models.chapters import Chapters
 router = APIRouter(prefix="/books", tags=["processing"])
 
 
+async def _dispatch_once(task, book_id: UUID):
+    """
+    Enqueue task for book_id unless the same dispatch happened moments ago
+    (double-clicks, client retries). The lock is released by the task itself.
+    """
+    acquired = await run_in_threadpool(acquire_dispatch_lock, task.name, str(book_id))
+    if not acquired:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Esta operação já foi iniciada para este livro"
+        )
+    try:
+        # .delay() writes to the broker socket synchronously: keep it off the event loop
+        return await run_in_threadpool(task.delay, book_id.bytes)
+    except Exception:
+        await run_in_threadpool(release_dispatch_lock, task.name, str(book_id))
+        raise
+
+
 @router.post("/{book_id}/process")
 async def start_book_processing(
     book_id: UUID,
@@ -26,40 +48,67 @@ async def start_book_processing(
     Inicia o processamento assíncrono de todos os vídeos do livro.
     
     Fluxo:
-    1. Verifica se o livro existe e pertence ao usuário
-    2. Verifica se já não está em processamento
-    3. Dispara task do Celery em background
-    4. Retorna imediatamente (usuário pode sair da página)
+    1. Marca o livro como PROCESSING se ele existe, pertence ao usuário
+       e ainda não está em processamento (um único UPDATE atômico)
+    2. Dispara task do Celery em background
+    3. Retorna imediatamente (usuário pode sair da página)
     
     Returns:
         Dict com mensagem, task_id e book_id
     """
     user_id = current_user["id"]
     
-    # Verificar se o livro existe e pertence ao usuário
-    book = db.query(Books).filter(Books.id == book_id).first()
-    
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Livro não encontrado"
+    # Claim the book atomically: ownership check and the status flip happen in
+    # one UPDATE, so two concurrent requests cannot both enqueue the task
+    claimed_id = db.execute(
+        update(Books)
+        .where(
+            Books.id == book_id,
+            Books.author_profile_id == user_id,
+            Books.status != "PROCESSING"
         )
-    
-    if str(book.author_profile_id) != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Você não tem permissão para processar este livro"
-        )
-    
-    # Verificar se já está em processamento
-    if book.status == "PROCESSING":
+        .values(status="PROCESSING")
+        .returning(Books.id)
+    ).scalar_one_or_none()
+    
+    if claimed_id is None:
+        # Nothing was updated: find out why with a light lookup
+        row = db.execute(
+            select(Books.author_profile_id, Books.status).where(Books.id == book_id)
+        ).first()
+        
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Livro não encontrado"
+            )
+        
+        if str(row.author_profile_id) != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Você não tem permissão para processar este livro"
+            )
+        
+        # Verificar se já está em processamento
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Este livro já está sendo processado"
         )
     
+    db.commit()
+    
     # Disparar task do Celery
-    task = process_book_videos.delay(str(book_id))
+    try:
+        # .delay() writes to the broker socket synchronously: keep it off the event loop
+        task = await run_in_threadpool(process_book_videos.delay, book_id.bytes)
+    except Exception as e:
+        # Release the claim so the user can retry
+        db.execute(update(Books).where(Books.id == book_id).values(status="ERROR"))
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Não foi possível iniciar o processamento. Tente novamente."
+        ) from e
     
     return {
         "message": "Processamento iniciado com sucesso",
@@ -70,36 +119,24 @@ async def start_book_processing(
 @router.post("/{book_id}/process-transcripts", status_code=status.HTTP_202_ACCEPTED)
 async def trigger_transcript_processing(
     book_id: UUID,
-    current_user: dict = Depends(get_current_user),
+    book: BookHeader = Depends(get_owned_book),
     db: Session = Depends(get_db)
 ):
     """
     Triggers the asynchronous processing of uploaded transcripts and slides.
     """
-    user_id = current_user["id"]
-    
-    # Verify book ownership
-    book = db.query(Books).filter(
-        Books.id == book_id,
-        Books.author_profile_id == user_id
-    ).first()
-    
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Book not found"
-        )
-    
     # Check if transcripts exist
-    transcripts_count = db.query(Transcription).filter(Transcription.book_id == book_id).count()
-    if transcripts_count == 0:
+    has_transcripts = db.query(
+        db.query(Transcription.id).filter(Transcription.book_id == book_id).exists()
+    ).scalar()
+    if not has_transcripts:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No transcripts uploaded for this book"
         )
     
     # Trigger Celery task
-    task = process_book_transcripts_task.delay(str(book_id))
+    task = await _dispatch_once(process_book_transcripts_task, book_id)
     
     return {
         "message": "Processing started",
@@ -110,36 +147,24 @@ async def trigger_transcript_processing(
 @router.post("/{book_id}/generate-content", status_code=status.HTTP_202_ACCEPTED)
 async def trigger_content_generation(
     book_id: UUID,
-    current_user: dict = Depends(get_current_user),
+    book: BookHeader = Depends(get_owned_book),
     db: Session = Depends(get_db)
 ):
     """
     Triggers the sequential generation of section content for the book.
     """
-    user_id = current_user["id"]
-    
-    # Verify book ownership
-    book = db.query(Books).filter(
-        Books.id == book_id,
-        Books.author_profile_id == user_id
-    ).first()
-    
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Livro não encontrado"
-        )
-    
     # Check if structure exists
-    chapters_count = db.query(Chapters).filter(Chapters.book_id == book_id).count()
-    if chapters_count == 0:
+    has_chapters = db.query(
+        db.query(Chapters.id).filter(Chapters.book_id == book_id).exists()
+    ).scalar()
+    if not has_chapters:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="A estrutura do livro ainda não foi gerada. Execute o Discovery primeiro."
         )
     
     # Trigger Celery task
-    task = process_book_content_sequential_task.delay(str(book_id))
+    task = await _dispatch_once(process_book_content_sequential_task, book_id)
     
     return {
         "message": "Geração de conteúdo iniciada",
@@ -3,7 +3,7 @@ Section Routes - API endpoints for specific section actions
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from uuid import UUID
+from starlette.concurrency import run_in_threadpool
 
 from database import get_db
 from models.sections import Sections
@@ -11,6 +11,7 @@ from models.chapters import Chapters
 from models.books import Books
 from security import get_current_user
 from tasks.transcript_tasks import process_section_content_task
+from utils.uuid_utils import normalize_uuid_string
 
 router = APIRouter(prefix="/sections", tags=["sections"])
 
@@ -26,9 +27,16 @@ async def generate_section_content_endpoint(
     """
     user_id = current_user["id"]
     
+    section_id = normalize_uuid_string(section_id)
+    if section_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="section_id inválido (formato UUID esperado)"
+        )
+    
     # Find section and verify ownership through book
     section = db.query(Sections).join(Chapters).join(Books).filter(
-        Sections.id == UUID(section_id),
+        Sections.id == section_id,
         Books.author_profile_id == user_id
     ).first()
     
@@ -41,6 +49,7 @@ async def generate_section_content_endpoint(
     # Check if section is already processing or done? 
     # For flexibility, we allow re-generating if requested (e.g. if it was an error)
     
-    process_section_content_task.delay(section_id, trigger_next=False)
+    # .delay() writes to the broker socket synchronously: keep it off the event loop
+    await run_in_threadpool(process_section_content_task.delay, section.id.bytes, trigger_next=False)
     
     return {"message": "Geração de conteúdo iniciada para a seção", "section_id": section_id}
@@ -1,20 +1,22 @@
 """
 Transcript Routes - API endpoints for transcription and slide upload
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, status, UploadFile, File, Form
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from uuid import UUID
+import asyncio
 import os
 import uuid
-import shutil
 
-from database import get_db
-from models.books import Books
+from database import get_db, uuid7
 from models.transcriptions import Transcription
 from models.slides import Slide
-from security import get_current_user
+from security import get_current_user, load_owned_book
 from tasks.transcript_tasks import process_book_transcripts_task
+from utils.file_utils import ensure_dir, save_upload
 
 router = APIRouter(prefix="/transcripts", tags=["transcripts"])
 
@@ -32,71 +34,49 @@ async def upload_transcripts(
     """
     user_id = current_user["id"]
     
-    # Verify book ownership
-    book = db.query(Books).filter(
-        Books.id == book_id,
-        Books.author_profile_id == user_id
-    ).first()
-    
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Book not found or you don't have permission"
-        )
+    # Verify book ownership (book_id comes from the form, not the path)
+    book = load_owned_book(book_id, user_id, db)
     
     # Define storage paths
     media_storage_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
     # Base structure: media/user_id/book_id/uploads/
     uploads_dir = os.path.join(media_storage_path, str(user_id), str(book_id), "uploads")
-    os.makedirs(uploads_dir, exist_ok=True)
-    
-    saved_transcripts = []
-    saved_slides = []
+    await run_in_threadpool(ensure_dir, uploads_dir)
     
-    # Process Transcripts
-    for file in transcripts:
-        # Generate unique filename to avoid collisions if needed, 
-        # but the prompt implies keeping name or at least saving mapping.
-        # We'll prepend UUID to avoid overwrite but keep original name in DB.
+    # Generate unique filenames to avoid collisions if needed, 
+    # but the prompt implies keeping name or at least saving mapping.
+    # We'll prepend UUID to avoid overwrite but keep original name in DB.
+    def _storage_path(file: UploadFile) -> str:
         file_ext = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        storage_path = os.path.join(uploads_dir, unique_filename)
-        
-        with open(storage_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        new_transcription = Transcription(
-            book_id=book_id,
-            filename=file.filename,
-            storage_path=storage_path
-        )
-        db.add(new_transcription)
-        saved_transcripts.append({
-            "id": str(new_transcription.id),
-            "filename": file.filename
-        })
-
-    # Process Slides (PDFs)
-    if pdfs:
-        for file in pdfs:
-            file_ext = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            storage_path = os.path.join(uploads_dir, unique_filename)
-            
-            with open(storage_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-                
-            new_slide = Slide(
-                book_id=book_id,
-                filename=file.filename,
-                storage_path=storage_path
-            )
-            db.add(new_slide)
-            saved_slides.append({
-                "id": str(new_slide.id),
-                "filename": file.filename
-            })
-            
+        return os.path.join(uploads_dir, f"{uuid.uuid4()}{file_ext}")
+    
+    transcript_paths = [_storage_path(file) for file in transcripts]
+    slide_paths = [_storage_path(file) for file in pdfs or []]
+    
+    # Write all files concurrently in the threadpool, off the event loop
+    await asyncio.gather(*(
+        run_in_threadpool(save_upload, file.file, path)
+        for file, path in zip(transcripts + (pdfs or []), transcript_paths + slide_paths)
+    ))
+    
+    # Ids are generated here so the response can report them without a flush;
+    # each table gets one executemany INSERT
+    transcript_rows = [
+        {"id": uuid7(), "book_id": book.id, "filename": file.filename, "storage_path": path}
+        for file, path in zip(transcripts, transcript_paths)
+    ]
+    slide_rows = [
+        {"id": uuid7(), "book_id": book.id, "filename": file.filename, "storage_path": path}
+        for file, path in zip(pdfs or [], slide_paths)
+    ]
+    if transcript_rows:
+        db.execute(insert(Transcription), transcript_rows)
+    if slide_rows:
+        db.execute(insert(Slide), slide_rows)
+    
+    saved_transcripts = [{"id": str(row["id"]), "filename": row["filename"]} for row in transcript_rows]
+    saved_slides = [{"id": str(row["id"]), "filename": row["filename"]} for row in slide_rows]
+    
     db.commit()
     
     return {
@@ -1,44 +1,99 @@
 """
 Video Routes - Endpoints for video upload and management
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Header
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from uuid import UUID, uuid4
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header
+from sqlalchemy import insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 import os
-import shutil
 
-from database import get_db
+from database import get_async_db, uuid7
 from models.videos import Videos
 from models.books import Books
 from schemas.video_schemas import VideoUploadResponse, VideoMetadata
 from security import get_current_user
+from tasks.video_processing import process_video
+from utils.file_utils import FileTooLargeError, move_file, remove_file
+from utils.upload_stream import MalformedUploadError, UnsupportedFileTypeError, stream_upload_to_disk
+from utils.uuid_utils import normalize_uuid_string
 
 router = APIRouter(prefix="/videos", tags=["Videos"])
 
+MEDIA_STORAGE_PATH = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
+
 # File validation constants
 MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024  # 2GB in bytes
-ALLOWED_VIDEO_TYPES = [
+# Allowance for multipart boundaries and the other form fields in Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+_VIDEO_TYPES = (
     "video/mp4",
     "video/mpeg",
     "video/quicktime",
     "video/x-msvideo",
     "video/webm",
     "video/x-matroska"  # .mkv
-]
+)
+ALLOWED_VIDEO_TYPES = frozenset(_VIDEO_TYPES)
+
+# Error messages are constant; build them once at import
+_UNSUPPORTED_TYPE_DETAIL = f"Tipo de arquivo não suportado. Tipos aceitos: {', '.join(_VIDEO_TYPES)}"
+_FILE_TOO_LARGE_DETAIL = f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE / (1024 * 1024 * 1024)}GB"
+
+
+# Request body documentation: the route parses multipart/form-data itself
+# (see utils.upload_stream), so FastAPI cannot derive it from parameters
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "book_id"],
+                    "properties": {
+                        "file": {
+                            "type": "string",
+                            "format": "binary",
+                            "description": "Arquivo de vídeo para upload"
+                        },
+                        "book_id": {
+                            "type": "string",
+                            "format": "uuid",
+                            "description": "UUID do livro ao qual o vídeo pertence"
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
 
 
-@router.post("/upload", response_model=VideoUploadResponse, status_code=status.HTTP_201_CREATED)
+def _file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=_FILE_TOO_LARGE_DETAIL
+    )
+
+
+@router.post(
+    "/upload",
+    response_model=VideoUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=_UPLOAD_OPENAPI
+)
 async def upload_video(
-    file: UploadFile = File(..., description="Arquivo de vídeo para upload"),
-    book_id: str = Form(..., description="UUID do livro ao qual o vídeo pertence"),
+    request: Request,
     authorization: str = Header(..., description="Bearer token JWT"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Upload de vídeo para armazenamento local e registro no banco de dados.
     
+    Corpo multipart/form-data com `file` (arquivo de vídeo) e `book_id`
+    (UUID do livro). O corpo é lido diretamente da requisição e o arquivo
+    gravado em disco uma única vez, sem passar por um arquivo temporário.
+    
     **Fluxo:**
     1. Valida autenticação JWT
     2. Valida tipo e tamanho do arquivo
@@ -59,112 +114,147 @@ async def upload_video(
     
     **Erros:**
     - 401: Token inválido ou expirado
-    - 400: Tipo de arquivo inválido ou tamanho excedido
+    - 400: Tipo de arquivo inválido ou corpo multipart inválido
     - 403: Livro não pertence ao usuário
     - 404: Livro não encontrado
+    - 413: Tamanho excedido
+    - 422: Campo obrigatório ausente
     - 500: Erro no upload ou salvamento
     """
-    # Step 1: Authenticate user
+    # Step 1: Authenticate user (before any of the body is read)
     current_user = get_current_user(authorization)
     user_id = current_user["id"]
     
-    # Step 2: Validate file type
-    if file.content_type not in ALLOWED_VIDEO_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Tipo de arquivo não suportado. Tipos aceitos: {', '.join(ALLOWED_VIDEO_TYPES)}"
-        )
-    
-    # Step 3: Validate file size (read file to get size)
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
+    # Step 2: Reject oversized requests from Content-Length before reading the body;
+    # the exact size is enforced while the file is streamed (Step 4)
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cabeçalho Content-Length inválido"
+            )
+        if int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+            raise _file_too_large()
     
-    if file_size > MAX_FILE_SIZE:
-        max_size_gb = MAX_FILE_SIZE / (1024 * 1024 * 1024)
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Arquivo muito grande. Tamanho máximo: {max_size_gb}GB"
-        )
+    # Step 3: Create video record ID
+    video_id = uuid7()
     
-    # Step 4: Validate book_id format
+    # Step 4: Stream the file part to a staging path under the user's media folder.
+    # Clients send `file` before `book_id`, so the book folder is not known yet;
+    # staging on the same filesystem lets Step 7 move the file with a rename.
+    # The content type is checked from the part headers before any data is written.
+    staging_path = os.path.join(MEDIA_STORAGE_PATH, str(user_id), "incoming", f"{video_id}.part")
     try:
-        book_uuid = UUID(book_id)
-    except ValueError:
+        upload = await stream_upload_to_disk(
+            request, "file", staging_path,
+            max_size=MAX_FILE_SIZE,
+            allowed_types=ALLOWED_VIDEO_TYPES
+        )
+    except FileTooLargeError:
+        raise _file_too_large()
+    except UnsupportedFileTypeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="book_id inválido (formato UUID esperado)"
+            detail=_UNSUPPORTED_TYPE_DETAIL
         )
-    
-    # Step 5: Validate book exists and belongs to user
-    book = db.query(Books).filter(Books.id == book_uuid).first()
-    if not book:
+    except MalformedUploadError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Livro não encontrado"
-        )
-    
-    if str(book.author_profile_id) != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Você não tem permissão para adicionar vídeos a este livro"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     
-    # Step 6: Create video record ID
-    video_id = uuid4()
-    
     try:
-        # Step 7: Get media storage path and create hierarchical structure
-        media_storage_path = os.getenv("MEDIA_STORAGE_PATH", "/app/media")
+        # Step 5: Validate book_id
+        book_id = upload.fields.get("book_id")
+        if book_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Campo obrigatório ausente: book_id"
+            )
+        book_uuid = normalize_uuid_string(book_id)
+        if book_uuid is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="book_id inválido (formato UUID esperado)"
+            )
         
-        # Create directory structure: media_storage/{user_id}/{book_id}/
-        book_folder = os.path.join(media_storage_path, str(user_id), str(book_uuid))
-        os.makedirs(book_folder, exist_ok=True)
+        # Step 6: Insert the video only if the book exists and belongs to the user,
+        # in one statement:
+        # INSERT INTO videos (...) SELECT :id, books.id, ... FROM books
+        # WHERE books.id = :book_id AND books.author_profile_id = :user_id
+        # RETURNING created_at
+        # The id is generated here and created_at comes back, so no refresh is needed.
+        # Unique filename from video_id to avoid conflicts:
+        # media_storage/{user_id}/{book_id}/{video_id}{ext}
+        book_folder = os.path.join(MEDIA_STORAGE_PATH, str(user_id), book_uuid)
+        file_extension = os.path.splitext(upload.filename)[1]  # Get original extension
+        local_file_path = os.path.join(book_folder, f"{video_id}{file_extension}")
+        created_at = await db.scalar(
+            insert(Videos).from_select(
+                ["id", "book_id", "storage_path", "duration", "filename"],
+                select(
+                    literal(video_id, Videos.id.type),
+                    Books.id,
+                    literal(local_file_path),
+                    literal(0.0),  # Will be calculated during processing phase
+                    literal(upload.filename)
+                ).where(Books.id == book_uuid, Books.author_profile_id == user_id)
+            ).returning(Videos.created_at)
+        )
+        if created_at is None:
+            # Nothing inserted: a second lookup (failure path only) picks 404 or 403
+            owner_id = await db.scalar(select(Books.author_profile_id).where(Books.id == book_uuid))
+            if owner_id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Livro não encontrado"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Você não tem permissão para adicionar vídeos a este livro"
+            )
         
-        # Step 8: Generate unique filename using video_id to avoid conflicts
-        file_extension = os.path.splitext(file.filename)[1]  # Get original extension
-        unique_filename = f"{video_id}{file_extension}"
-        local_file_path = os.path.join(book_folder, unique_filename)
+        # Step 7: Move the file into the book folder (a rename, no copy), then commit,
+        # so a failed move rolls the row back
+        await run_in_threadpool(move_file, staging_path, local_file_path)
+        await db.commit()
         
-        # Step 9: Save file to local storage
-        with open(local_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Step 8: Hand post-upload processing (duration probe) to the worker.
+        # The record is already committed, so a broker failure must not fail the upload.
+        try:
+            await run_in_threadpool(process_video.delay, video_id.bytes, local_file_path)
+        except Exception as e:
+            print(f"Warning: Failed to enqueue processing for video {video_id}: {e}")
         
-        # Step 10: Save to database
-        video_record = Videos(
-            id=video_id,
-            book_id=book_uuid,
-            storage_path=local_file_path,
-            duration=0,  # Will be calculated during processing phase
-            filename=file.filename
-        )
-        db.add(video_record)
-        db.commit()
-        db.refresh(video_record)
-        
-        # Step 11: Prepare response
+        # Step 9: Prepare response
         metadata = VideoMetadata(
-            filename=video_record.filename,
-            duration=video_record.duration,
-            size_bytes=file_size,
-            created_at=video_record.created_at
+            filename=upload.filename,
+            duration=0,
+            size_bytes=upload.size,
+            created_at=created_at
         )
         
         return VideoUploadResponse(
-            id=video_record.id,
-            book_id=video_record.book_id,
-            file_uri=video_record.storage_path,
+            id=video_id,
+            book_id=book_uuid,
+            file_uri=local_file_path,
             status="SAVED",
             metadata=metadata,
             message="Upload realizado com sucesso"
         )
         
+    except HTTPException:
+        await run_in_threadpool(remove_file, staging_path)
+        raise
     except Exception as e:
-        db.rollback()
-        # Try to clean up file if it was created
-        if 'local_file_path' in locals() and os.path.exists(local_file_path):
+        await db.rollback()
+        # Try to clean up the file wherever it currently is
+        for path in (staging_path, local_file_path):
+            if path is None:
+                continue
             try:
-                os.remove(local_file_path)
+                await run_in_threadpool(remove_file, path)
             except Exception:
                 pass
         raise HTTPException(
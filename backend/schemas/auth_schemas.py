@@ -1,7 +1,7 @@
 """
 Authentication Schemas - Request/Response validation for auth endpoints
 """
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 from uuid import UUID
 from typing import Optional
 
@@ -42,8 +42,7 @@ class UserResponse(BaseModel):
     email: str = Field(..., description="User's email address")
     full_name: str = Field(..., description="User's full name")
     
-    class Config:
-        from_attributes = True  # Allows creating from ORM models
+    model_config = ConfigDict(from_attributes=True)  # Allows creating from ORM models
 
 
 class AuthResponse(BaseModel):
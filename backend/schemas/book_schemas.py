@@ -1,7 +1,7 @@
 """
 Book Schemas - Pydantic models for API requests/responses
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from uuid import UUID
 from typing import Optional
@@ -32,11 +32,12 @@ class BookResponse(BaseModel):
     created_at: datetime
     video_count: int = Field(default=0, description="Number of videos in this book")
 
-    class Config:
-        from_attributes = True
-        json_encoders = {
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_encoders={
             datetime: lambda v: v.isoformat()
         }
+    )
 
 
 class BookDetailResponse(BaseModel):
@@ -51,8 +52,9 @@ class BookDetailResponse(BaseModel):
     created_at: datetime
     videos: list[dict] = Field(default_factory=list, description="List of videos in this book")
 
-    class Config:
-        from_attributes = True
-        json_encoders = {
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_encoders={
             datetime: lambda v: v.isoformat()
         }
+    )
@@ -1,7 +1,7 @@
 """
 Chapter and Section Schemas - Request/Response validation for chapter endpoints
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from uuid import UUID
 from typing import List, Optional
 from datetime import datetime
@@ -17,8 +17,7 @@ class SectionAssetResponse(BaseModel):
     slide_page: Optional[int] = None
     crop_info: Optional[dict] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SectionResponse(BaseModel):
@@ -35,8 +34,7 @@ class SectionResponse(BaseModel):
     video_filename: Optional[str] = Field(None, description="Source video filename")
     assets: List[SectionAssetResponse] = Field(default_factory=list, description="List of assets (images) for this section")
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ChapterResponse(BaseModel):
@@ -49,8 +47,13 @@ class ChapterResponse(BaseModel):
     created_at: datetime = Field(..., description="Creation timestamp")
     sections: List[SectionResponse] = Field(default_factory=list, description="List of sections in this chapter")
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Built once at import. Routes that already hold constructed ChapterResponse
+# objects serialize them with dump_json, skipping FastAPI's response_model
+# re-validation and its dict -> JSON pass.
+ChapterListAdapter = TypeAdapter(List[ChapterResponse])
 
 
 class ChapterUpdate(BaseModel):
@@ -1,7 +1,7 @@
 """
 Video Schemas - Pydantic models for video upload operations
 """
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, ConfigDict, Field, UUID4
 from datetime import datetime
 from typing import Optional
 
@@ -13,8 +13,8 @@ class VideoMetadata(BaseModel):
     size_bytes: Optional[int] = Field(None, description="Tamanho do arquivo em bytes")
     created_at: datetime = Field(..., description="Data de criação do registro")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "filename": "aula_01.mp4",
                 "duration": 1234.5,
@@ -22,6 +22,7 @@ class VideoMetadata(BaseModel):
                 "created_at": "2024-01-15T10:30:00Z"
             }
         }
+    )
 
 
 class VideoUploadResponse(BaseModel):
@@ -33,8 +34,8 @@ class VideoUploadResponse(BaseModel):
     metadata: VideoMetadata = Field(..., description="Metadados do arquivo")
     message: str = Field(default="Upload realizado com sucesso", description="Mensagem de sucesso")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "id": "550e8400-e29b-41d4-a716-446655440000",
                 "book_id": "660e8400-e29b-41d4-a716-446655440001",
@@ -49,3 +50,4 @@ class VideoUploadResponse(BaseModel):
                 "message": "Upload realizado com sucesso"
             }
         }
+    )
@@ -1,23 +1,59 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+from uuid import UUID
 import os
+import threading
+import time
+
+from cachetools import TTLCache
 
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from fastapi import HTTPException, status, Header
+from jose.backends import HMACKey
+from fastapi import Depends, HTTPException, Path, status, Header
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models.books import Books
 
 # Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# PASSWORD_HASH_SCHEME picks the scheme for new hashes ("argon2" needs argon2-cffi);
+# bcrypt stays accepted so existing hashes keep verifying.
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=list(dict.fromkeys([PASSWORD_HASH_SCHEME, "bcrypt"])),
+    default=PASSWORD_HASH_SCHEME,
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS
+)
 
 # JWT configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-key-CHANGE-IN-PRODUCTION")
 ALGORITHM = "HS256"
+
+# python-jose[cryptography] signs/verifies HS256 through OpenSSL via the
+# cryptography backend; without it jose silently falls back to its native keys.
+if HMACKey.__module__ != "jose.backends.cryptography_backend":
+    print("Warning: python-jose is not using the cryptography backend; install python-jose[cryptography]")
 ACCESS_TOKEN_EXPIRE_DAYS = 30
 
+# Verified tokens -> (user_id, exp). Keys are the full signed token string, so a
+# hit is only possible for a token that already passed signature verification.
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+TOKEN_CACHE_MAXSIZE = int(os.getenv("TOKEN_CACHE_MAXSIZE", "10000"))
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAXSIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
 
 def hash_password(password: str) -> str:
     """
-    Generate bcrypt hash for a password.
+    Generate a hash for a password with the configured scheme.
+    
+    CPU-bound (~250ms for bcrypt at 12 rounds): call it through
+    run_in_threadpool from async routes.
     
     Args:
         password: Plain text password
@@ -32,6 +68,8 @@ def verify_password(plain_password: str, password_hash: str) -> bool:
     """
     Verify a password against its hash.
     
+    CPU-bound like hash_password: call it through run_in_threadpool from async routes.
+    
     Args:
         plain_password: Plain text password to verify
         password_hash: Stored password hash
@@ -102,13 +140,83 @@ def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
     except ValueError:
         raise credentials_exception
     
+    user_id = _decode_user_id(token)
+    if user_id is None:
+        raise credentials_exception
+    return {"id": user_id}
+
+
+def _decode_user_id(token: str) -> Optional[str]:
+    """
+    Verify a JWT and return its subject, or None if the token is invalid.
+    
+    Successful verifications are cached for TOKEN_CACHE_TTL_SECONDS so repeated
+    requests with the same token skip the HMAC check. The token's own "exp" is
+    still enforced on cache hits.
+    """
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None:
+        user_id, exp = cached
+        if exp is None or exp > now:
+            return user_id
+        with _token_cache_lock:
+            _token_cache.pop(token, None)
+        return None
+    
     # Decode and validate token
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        return {"id": user_id}
     except JWTError:
-        raise credentials_exception
+        return None
+    
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+    
+    with _token_cache_lock:
+        _token_cache[token] = (user_id, payload.get("exp"))
+    return user_id
+
+
+@dataclass(frozen=True)
+class BookHeader:
+    """The few book columns that ownership-checked endpoints actually use."""
+    id: UUID
+    status: str
+
+
+def load_owned_book(book_id, user_id: str, db: Session) -> BookHeader:
+    """
+    Fetch (id, status) of a book owned by user_id in one narrow query.
+    
+    Raises:
+        HTTPException 404: If the book does not exist or belongs to someone else
+    """
+    row = db.execute(
+        select(Books.id, Books.status).where(
+            Books.id == book_id,
+            Books.author_profile_id == user_id
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Livro não encontrado"
+        )
+    return BookHeader(id=row.id, status=row.status)
 
+
+def get_owned_book(
+    book_id: UUID = Path(...),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> BookHeader:
+    """
+    FastAPI dependency for routes with a {book_id} path parameter:
+        @router.post("/{book_id}/something")
+        def route(book: BookHeader = Depends(get_owned_book)):
+            ...
+    """
+    return load_owned_book(book_id, current_user["id"], db)
@@ -4,16 +4,67 @@ Encapsulates communication with Google Gemini 2.5 Flash for generating education
 """
 
 import os
-import json
+import orjson
+import asyncio
+import functools
+import hashlib
 import logging
+import random
+import re
+import weakref
 from typing import Dict, Any, Optional, List
-import google.generativeai as genai
-from google.generativeai import GenerativeModel
+from datetime import timedelta
+import fitz  # PyMuPDF
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types
 from fastapi import HTTPException, status
 
+from utils.cache import gemini_file_cache, gemini_section_context_cache
+
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Uploads to the Gemini File API are network-bound: run up to this many at once
+GEMINI_UPLOAD_CONCURRENCY = int(os.getenv("GEMINI_UPLOAD_CONCURRENCY", "8"))
+# Attempts per file before giving up; waits double from 1s (plus jitter) between them
+GEMINI_UPLOAD_ATTEMPTS = 5
+# Section generations in flight at once in generate_sections_content (rate limit guard)
+GEMINI_SECTION_CONCURRENCY = int(os.getenv("GEMINI_SECTION_CONCURRENCY", "8"))
+
+SECTION_MODEL = "gemini-2.5-flash"
+# Lifetime of the section context (instruction + transcript/slide) cached on
+# Gemini's side; see utils.cache.GEMINI_SECTION_CONTEXT_TTL_SECONDS
+SECTION_CONTEXT_CACHE_TTL = timedelta(hours=1)
+
+# JSON recovery in _parse_json_response: a leading ```json / ``` and trailing ```
+# fence, the outermost {...} block, and "key": "value" strings with raw newlines
+_FENCE_RE = re.compile(r"\A```(?:json)?|```\Z")
+_JSON_BLOCK_RE = re.compile(r"\{.*\}", re.DOTALL)
+_NEWLINE_FIX_RE = re.compile(r'":\s*"(.*?)"\s*([,}])', re.DOTALL)
+
+# google-genai clients, one per event loop: the async HTTP pool of a client is
+# bound to the loop it first ran on, and Celery tasks call into this module
+# under a fresh asyncio.run() each time
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, genai.Client]" = weakref.WeakKeyDictionary()
+
+
+def _get_client() -> genai.Client:
+    """Return the google-genai client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not google_api_key:
+            raise RuntimeError("GOOGLE_API_KEY missing")
+        client = _clients[loop] = genai.Client(api_key=google_api_key)
+    return client
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    """True if exc is Gemini rejecting a call for exceeding the quota (HTTP 429)."""
+    return isinstance(exc, genai_errors.APIError) and exc.code == 429
+
 # System Instructions for Phase 1: Discovery (Skeleton Generation)
 DISCOVERY_INSTRUCTION = """
 Você é um Arquiteto de Estrutura Educacional. Sua missão é analisar múltiplos arquivos de transcrição e slides de um curso e criar um sumário lógico (esqueleto) para um livro didático.
@@ -143,6 +194,128 @@ NÃO repita o objeto JSON.
 }
 """
 
+# Generation configs are built once: the system instructions are several KB
+_DISCOVERY_CONFIG = types.GenerateContentConfig(
+    system_instruction=DISCOVERY_INSTRUCTION,
+    temperature=0.2,
+    response_mime_type="application/json"
+)
+
+_SECTION_CONFIG = types.GenerateContentConfig(
+    system_instruction=DEEP_ANALYSIS_INSTRUCTION,
+    temperature=0.3,  # Lower temperature for more stable JSON
+    response_mime_type="application/json"
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_section_config(cache_name: str) -> types.GenerateContentConfig:
+    """Section config for a cached context, which already holds the system instruction."""
+    return types.GenerateContentConfig(
+        cached_content=cache_name,
+        temperature=_SECTION_CONFIG.temperature,
+        response_mime_type=_SECTION_CONFIG.response_mime_type
+    )
+
+
+async def _upload_with_retry(path: str, display_name: str, mime_type: Optional[str] = None) -> types.File:
+    """
+    Upload a file to the Gemini File API, retrying transient failures with
+    exponential backoff.
+    
+    The SDK sends the file through the File API's resumable upload protocol.
+    That protocol takes chunks strictly in order and has no Content-Encoding
+    support, so bytes go out as stored: a gzipped body would be kept as the
+    file's content. Always pass mime_type for stored files, because their
+    names need not end in the right extension.
+    """
+    config = types.UploadFileConfig(display_name=display_name, mime_type=mime_type)
+    for attempt in range(1, GEMINI_UPLOAD_ATTEMPTS + 1):
+        try:
+            return await _get_client().aio.files.upload(file=path, config=config)
+        except Exception as e:
+            if attempt == GEMINI_UPLOAD_ATTEMPTS:
+                raise
+            delay = 2 ** (attempt - 1) + random.uniform(0, 0.5)
+            logger.warning(f"Upload of {display_name} failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def _invalid_pdf(path: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"PDF inválido ou vazio: {os.path.basename(path)}"
+    )
+
+
+def _pdf_digest(path: str) -> str:
+    """
+    Open a stored PDF once and return the SHA-256 of its content. Missing
+    files (404), empty files (fstat of the open handle) and files without a
+    %PDF- header in their first 1 KiB (400) are rejected on the way, with no
+    separate exists/getsize calls.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Arquivo não encontrado: {os.path.basename(path)}"
+        )
+    with f:
+        if os.fstat(f.fileno()).st_size == 0 or b"%PDF-" not in f.read(1024):
+            raise _invalid_pdf(path)
+        f.seek(0)
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _validate_pdf_pages(path: str) -> None:
+    """
+    PyMuPDF must find at least one page, so truncated or corrupt PDFs fail
+    here instead of after a full upload to Gemini.
+    """
+    page_count = 0
+    try:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+    except Exception as e:
+        logger.warning(f"Could not open PDF {path}: {e}")
+    if page_count == 0:
+        raise _invalid_pdf(path)
+
+
+async def _upload_or_reuse(path: str, display_name: str, mime_type: Optional[str] = None) -> types.Part:
+    """
+    Return a part referencing the file's content on the Gemini File API,
+    uploading it only if the same bytes (by SHA-256) were not uploaded within
+    GEMINI_UPLOAD_CACHE_TTL_SECONDS. Re-runs and books sharing a PDF reuse the
+    earlier upload. New files also have their pages checked first.
+    """
+    content_hash = await asyncio.to_thread(_pdf_digest, path)
+    cached = await asyncio.to_thread(gemini_file_cache.get, content_hash)
+    if cached is not None:
+        file_uri, cached_mime_type = cached
+        logger.info(f"Reusing Gemini upload of {display_name}: {file_uri}")
+        return types.Part.from_uri(file_uri=file_uri, mime_type=cached_mime_type)
+
+    await asyncio.to_thread(_validate_pdf_pages, path)
+    uploaded = await _upload_with_retry(path, display_name, mime_type)
+    await asyncio.to_thread(gemini_file_cache.set, content_hash, [uploaded.uri, uploaded.mime_type])
+    return types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type)
+
+
+async def _upload_pdf(path: str, display_name: str, semaphore: asyncio.Semaphore) -> types.Part:
+    """
+    Upload a stored PDF as-is: the file name shown by Gemini comes from
+    display_name and the MIME type is given explicitly, so the on-disk name
+    never matters and no temp copy is needed. At most GEMINI_UPLOAD_CONCURRENCY
+    uploads hold the semaphore at once.
+    """
+    async with semaphore:
+        logger.info(f"Uploading {display_name} for discovery: {path}")
+        return await _upload_or_reuse(path, display_name, mime_type="application/pdf")
+
+
 async def generate_book_discovery(
     transcriptions: List[Dict[str, str]],  # List of {"id": uuid, "path": path}
     slides: List[Dict[str, str]] = None     # List of {"id": uuid, "path": path}
@@ -150,73 +323,45 @@ async def generate_book_discovery(
     """
     Phase 1: Generates the book skeleton using Gemini 2.5 Flash.
     """
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    if not google_api_key:
-        raise RuntimeError("GOOGLE_API_KEY missing")
-
-    genai.configure(api_key=google_api_key)
-    model = GenerativeModel(model_name="gemini-2.5-flash", system_instruction=DISCOVERY_INSTRUCTION)
-    
-    prompt_parts = ["Analise estes arquivos e gere o sumário do livro.\n\n"]
+    client = _get_client()
     
-    # Lista de IDs válidos (para referência)
-    prompt_parts.append("=== LISTA DE IDs VÁLIDOS ===\n")
-    prompt_parts.append("TRANSCRIÇÕES:\n")
-    for t in transcriptions:
-        prompt_parts.append(f"  - {t['id']}\n")
+    slides = slides or []
     
+    # Lista de IDs válidos (para referência) e cabeçalho dos arquivos, num só bloco de texto
+    id_list = "TRANSCRIÇÕES:\n" + "".join(f"  - {t['id']}\n" for t in transcriptions)
     if slides:
-        prompt_parts.append("\nSLIDES:\n")
-        for s in slides:
-            prompt_parts.append(f"  - {s['id']}\n")
-    
-    prompt_parts.append("\n=== ARQUIVOS COM SEUS IDs ===\n\n")
+        id_list += "\nSLIDES:\n" + "".join(f"  - {s['id']}\n" for s in slides)
+    text = (
+        "Analise estes arquivos e gere o sumário do livro.\n\n"
+        "=== LISTA DE IDs VÁLIDOS ===\n"
+        + id_list +
+        "\n=== ARQUIVOS COM SEUS IDs ===\n\n"
+    )
     
-    # Upload transcriptions com ID ANTES do arquivo
-    import shutil
-    import tempfile
+    # Upload every transcription and slide concurrently, then add them to the
+    # prompt in their original order, each with its ID ANTES do arquivo (CRÍTICO!)
+    semaphore = asyncio.Semaphore(GEMINI_UPLOAD_CONCURRENCY)
+    uploads = [
+        _upload_pdf(t["path"], f"Transcript_{idx}", semaphore)
+        for idx, t in enumerate(transcriptions, 1)
+    ] + [
+        _upload_pdf(s["path"], f"Slide_{idx}", semaphore)
+        for idx, s in enumerate(slides, 1)
+    ]
+    file_objs = await asyncio.gather(*uploads)
     
-    temp_dir = tempfile.gettempdir()
+    id_labels = [f"TRANSCRIÇÃO ID: {t['id']}\n" for t in transcriptions]
+    id_labels += [f"SLIDE ID: {s['id']}\n" for s in slides]
     
-    for idx, t in enumerate(transcriptions, 1):
-        # Use a temporary simple name to avoid issues with long/special filenames in Gemini API
-        temp_path = os.path.join(temp_dir, f"transcription_{idx}_{t['id']}.pdf")
-        shutil.copy2(t['path'], temp_path)
-        
-        try:
-            logger.info(f"Uploading transcription {idx} for discovery: {temp_path}")
-            file_obj = genai.upload_file(path=temp_path, display_name=f"Transcript_{idx}")
-            
-            # ID ANTES do arquivo (CRÍTICO!)
-            prompt_parts.append(f"TRANSCRIÇÃO ID: {t['id']}\n")
-            prompt_parts.append(file_obj)
-            prompt_parts.append("\n")
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-    
-    # Upload slides com ID ANTES do arquivo
-    if slides:
-        for idx, s in enumerate(slides, 1):
-            temp_path = os.path.join(temp_dir, f"slide_{idx}_{s['id']}.pdf")
-            shutil.copy2(s['path'], temp_path)
-            
-            try:
-                logger.info(f"Uploading slide {idx} for discovery: {temp_path}")
-                file_obj = genai.upload_file(path=temp_path, display_name=f"Slide_{idx}")
-                
-                # ID ANTES do arquivo (CRÍTICO!)
-                prompt_parts.append(f"SLIDE ID: {s['id']}\n")
-                prompt_parts.append(file_obj)
-                prompt_parts.append("\n")
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+    # Only the files are separate elements: the text between two files is
+    # merged into one string (newline after the previous file + next ID)
+    prompt_parts = []
+    for id_label, file_obj in zip(id_labels, file_objs):
+        prompt_parts += [text + id_label, file_obj]
+        text = "\n"
     
     # Instrução final
-    prompt_parts.append("""
+    prompt_parts.append(text + """
 === INSTRUÇÕES FINAIS ===
 
 Para cada seção que você criar:
@@ -230,17 +375,7 @@ Gere o JSON do sumário agora.
 
     logger.info("Calling Gemini Flash for Discovery...")
     
-    generation_config = genai.GenerationConfig(
-        temperature=0.2,
-        response_mime_type="application/json"
-    )
-    
-    response = model.generate_content(
-        prompt_parts,
-        generation_config=generation_config
-    )
-    
-    return _parse_json_response(response.text)
+    return await _generate_json(client, "gemini-2.5-flash", prompt_parts, _DISCOVERY_CONFIG, "Discovery")
 
 async def generate_section_content(
     section_title: str,
@@ -250,87 +385,158 @@ async def generate_section_content(
 ) -> Dict[str, Any]:
     """
     Phase 2: Generates detailed content for a single section using Gemini 1.5 Pro.
+    
+    DEEP_ANALYSIS_INSTRUCTION plus the uploaded transcript/slide are stored as
+    Gemini cached content, shared by every section built from the same sources;
+    when caching is unavailable the full prompt is sent as before.
     """
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    if not google_api_key:
-        raise RuntimeError("GOOGLE_API_KEY missing")
-
-    genai.configure(api_key=google_api_key)
-    model = GenerativeModel(model_name="gemini-2.5-flash", system_instruction=DEEP_ANALYSIS_INSTRUCTION)
+    client = _get_client()
     
-    prompt_parts = [
+    section_prompt = [
         f"Escreva o conteúdo para a seção '{section_title}' do capítulo '{chapter_title}'.",
-        "Utilize as fontes anexadas abaixo:"
+        "Utilize as fontes anexadas (transcrição e slides).",
+        "Gere o JSON com content_markdown, bibliography e assets."
     ]
     
-    # Upload transcript context
-    transcript_file = genai.upload_file(path=transcript_path, display_name="Context_Transcript")
-    prompt_parts.append("Transcrição:")
-    prompt_parts.append(transcript_file)
+    cache_key = f"{transcript_path}|{slide_path or ''}"
+    cache_name = await asyncio.to_thread(gemini_section_context_cache.get, cache_key)
+    if cache_name is not None:
+        try:
+            logger.info(f"Calling Gemini Flash for Section Content (cached context): {section_title}...")
+            return await _generate_json(
+                client, SECTION_MODEL, section_prompt, _cached_section_config(cache_name), section_title
+            )
+        except genai_errors.ClientError as e:
+            # Gemini answers 403 ("CachedContent not found (or permission denied)")
+            # or 404 once the cached content expired or was deleted on its side
+            if e.code not in (403, 404):
+                raise
+            logger.info(f"Cached context {cache_name} is gone; rebuilding it")
+            await asyncio.to_thread(gemini_section_context_cache.delete, cache_key)
     
-    # Upload slide context if provided
+    # Upload transcript and slide context concurrently
+    uploads = [_upload_or_reuse(transcript_path, "Context_Transcript", mime_type="application/pdf")]
     if slide_path:
-        slide_file = genai.upload_file(path=slide_path, display_name="Context_Slide")
-        prompt_parts.append("Slides:")
-        prompt_parts.append(slide_file)
+        uploads.append(_upload_or_reuse(slide_path, "Context_Slide", mime_type="application/pdf"))
+    transcript_file, *slide_files = await asyncio.gather(*uploads)
+    
+    context_parts = ["Transcrição:", transcript_file]
+    if slide_files:
+        context_parts += ["Slides:", slide_files[0]]
     
-    prompt_parts.append("Gere o JSON com content_markdown, bibliography e assets.")
+    try:
+        cached = await client.aio.caches.create(
+            model=SECTION_MODEL,
+            config=types.CreateCachedContentConfig(
+                system_instruction=DEEP_ANALYSIS_INSTRUCTION,
+                contents=context_parts,
+                ttl=f"{int(SECTION_CONTEXT_CACHE_TTL.total_seconds())}s"
+            )
+        )
+    except Exception as e:
+        # E.g. sources below the minimum cacheable token count
+        logger.info(f"Context caching unavailable for {transcript_path}: {e}")
+        generation_config = _SECTION_CONFIG
+        prompt_parts = section_prompt[:2] + context_parts + section_prompt[2:]
+    else:
+        await asyncio.to_thread(gemini_section_context_cache.set, cache_key, cached.name)
+        generation_config = _cached_section_config(cached.name)
+        prompt_parts = section_prompt
 
     logger.info(f"Calling Gemini Flash for Section Content: {section_title}...")
     
-    generation_config = genai.GenerationConfig(
-        temperature=0.3,  # Lower temperature for more stable JSON
-        response_mime_type="application/json"
-    )
-    
-    response = model.generate_content(
-        prompt_parts,
-        generation_config=generation_config
-    )
-    
-    return _parse_json_response(response.text)
+    return await _generate_json(client, SECTION_MODEL, prompt_parts, generation_config, section_title)
+
+async def generate_sections_content(sections: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Phase 2 for several sections at once. Each item holds the keyword arguments
+    of generate_section_content; at most GEMINI_SECTION_CONCURRENCY calls run
+    at a time. Results come back in input order, with the raised exception in
+    place of the result for a section that failed.
+
+    The first section of each distinct source set runs in a first wave so it
+    creates the shared context cache; the remaining sections then only send
+    their short prompt instead of racing to cache the same sources.
+    """
+    semaphore = asyncio.Semaphore(GEMINI_SECTION_CONCURRENCY)
+
+    async def bounded(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await generate_section_content(**kwargs)
+
+    first_wave, rest, seen_sources = [], [], set()
+    for index, kwargs in enumerate(sections):
+        sources = (kwargs["transcript_path"], kwargs.get("slide_path"))
+        if sources in seen_sources:
+            rest.append(index)
+        else:
+            seen_sources.add(sources)
+            first_wave.append(index)
+
+    results: List[Any] = [None] * len(sections)
+    for wave in (first_wave, rest):
+        wave_results = await asyncio.gather(
+            *(bounded(sections[index]) for index in wave),
+            return_exceptions=True
+        )
+        for index, result in zip(wave, wave_results):
+            results[index] = result
+    return results
+
+async def _generate_json(
+    client: genai.Client,
+    model: str,
+    contents: List[Any],
+    config: types.GenerateContentConfig,
+    label: str
+) -> Dict[str, Any]:
+    """
+    Stream a JSON response from Gemini and parse it once complete. Chunks are
+    collected as the model produces them, so the connection never sits idle
+    through a long generation and progress shows up in the debug log.
+    """
+    parts = []
+    received = 0
+    stream = await client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+    async for chunk in stream:
+        if chunk.text:
+            parts.append(chunk.text)
+            received += len(chunk.text)
+            logger.debug(f"{label}: {received} characters received")
+    return _parse_json_response("".join(parts))
 
 def _parse_json_response(text: str) -> Dict[str, Any]:
     """Helper to parse JSON from Gemini response with increased robustness"""
-    import re
-    
     logger.debug(f"Parsing AI response: {text[:200]}...")
     
     # Try to clean markdown
-    cleaned = text.strip()
-    if cleaned.startswith("```json"):
-        cleaned = cleaned[7:]
-    elif cleaned.startswith("```"):
-        cleaned = cleaned[3:]
-    if cleaned.endswith("```"):
-        cleaned = cleaned[:-3]
-    
-    cleaned = cleaned.strip()
+    cleaned = _FENCE_RE.sub("", text.strip()).strip()
     
     # Pre-processing: Try to fix common JSON issues in AI output
     # 1. Handle unescaped backslashes (but not the ones for escaping quotes)
     # 2. Handle potential multi-line strings if any (JSON doesn't allow raw newlines in strings)
     
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as initial_err:
+        return orjson.loads(cleaned)
+    except orjson.JSONDecodeError as initial_err:
         logger.warning(f"Initial JSON parse failed: {initial_err}. Attempting aggressive recovery.")
         
         # Recovery strategy 1: Find everything between the first { and the last }
-        match = re.search(r'(\{.*\})', cleaned, re.DOTALL)
+        match = _JSON_BLOCK_RE.search(cleaned)
         if match:
-            potential_json = match.group(1)
+            potential_json = match.group(0)
             try:
-                return json.loads(potential_json)
-            except json.JSONDecodeError:
+                return orjson.loads(potential_json)
+            except orjson.JSONDecodeError:
                 # Recovery strategy 2: Try to fix unescaped newlines in markdown strings
                 # This regex looks for strings that might contain brand newlines
-                fixed = re.sub(r'":\s*"(.*?)"\s*([,}])', 
-                               lambda m: '": "' + m.group(1).replace('\n', '\\n').replace('\r', '\\r') + '"' + m.group(2), 
-                               potential_json, flags=re.DOTALL)
+                fixed = _NEWLINE_FIX_RE.sub(
+                    lambda m: '": "' + m.group(1).replace('\n', '\\n').replace('\r', '\\r') + '"' + m.group(2),
+                    potential_json
+                )
                 try:
-                    return json.loads(fixed)
-                except json.JSONDecodeError as final_err:
+                    return orjson.loads(fixed)
+                except orjson.JSONDecodeError as final_err:
                     logger.error(f"Aggressive recovery failed. Error: {final_err}")
                     logger.error(f"Problematic JSON string: {potential_json[:1000]}...")
         
@@ -3,17 +3,17 @@ PDF Service - Generates a complete PDF ebook from a Book's chapters and sections
 Uses ReportLab for PDF rendering and markdown+BeautifulSoup for content conversion.
 """
 
-import io
 import os
 import re
 import logging
 from uuid import UUID
-from typing import List, Tuple
+from typing import BinaryIO, List, Tuple
 
 import markdown
 from bs4 import BeautifulSoup
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm, mm
@@ -32,7 +32,6 @@ from reportlab.platypus import (
 from models.books import Books
 from models.chapters import Chapters
 from models.sections import Sections
-from models.section_assets import SectionAssets
 from models.global_references import GlobalReferences
 from services.image_extraction_service import extract_image_from_slide
 
@@ -183,12 +182,16 @@ def _footer(canvas, doc):
 # Função principal
 # ============================================
 
-def generate_book_pdf(book_id: UUID, db: Session) -> Tuple[bytes, str]:
+def generate_book_pdf(book_id: UUID, db: Session, output: BinaryIO) -> str:
     """
-    Gera o PDF completo de um livro.
+    Gera o PDF completo de um livro, escrevendo-o em `output`.
+
+    Args:
+        output: arquivo binário gravável (ex.: SpooledTemporaryFile) que
+            recebe o PDF; a posição final fica no fim do documento.
 
     Returns:
-        Tuple de (pdf_bytes, book_title) para que a rota possa montar
+        O título do livro, para que a rota possa montar
         o header Content-Disposition com o título original.
 
     Raises:
@@ -196,33 +199,29 @@ def generate_book_pdf(book_id: UUID, db: Session) -> Tuple[bytes, str]:
         HTTPException 409 – nem todas as seções estão com status SUCCESS.
     """
 
-    # 1. Buscar livro
-    book: Books | None = db.query(Books).filter(Books.id == book_id).first()
+    # 1. Buscar livro com capítulos, seções e assets (uma query por nível,
+    #    em vez de uma query por capítulo e por seção)
+    book: Books | None = db.execute(
+        select(Books)
+        .where(Books.id == book_id)
+        .options(
+            selectinload(Books.chapters)
+            .selectinload(Chapters.sections)
+            .selectinload(Sections.assets)
+        )
+    ).scalar_one_or_none()
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Livro não encontrado.",
         )
 
-    # 2. Capítulos ordenados
-    chapters: List[Chapters] = (
-        db.query(Chapters)
-        .filter(Chapters.book_id == book_id)
-        .order_by(Chapters.order.asc())
-        .all()
-    )
-
-    # 3. Seções por capítulo + verificação de prontidão
+    # 2-3. Capítulos e seções (já ordenados pelos relationships) + verificação de prontidão
     chapter_sections: list[Tuple[Chapters, List[Sections]]] = []
     not_ready_count = 0
 
-    for chapter in chapters:
-        sections: List[Sections] = (
-            db.query(Sections)
-            .filter(Sections.chapter_id == chapter.id)
-            .order_by(Sections.order.asc())
-            .all()
-        )
+    for chapter in book.chapters:
+        sections: List[Sections] = chapter.sections
         for section in sections:
             if section.status not in ["SUCCESS", "SUCESSO"]:
                 not_ready_count += 1
@@ -247,10 +246,10 @@ def generate_book_pdf(book_id: UUID, db: Session) -> Tuple[bytes, str]:
 
     # 5. Montar o PDF
     styles = _build_styles()
-    buffer = io.BytesIO()
+    start = output.tell()
 
     doc = SimpleDocTemplate(
-        buffer,
+        output,
         pagesize=A4,
         topMargin=2 * cm,
         bottomMargin=2 * cm,
@@ -303,14 +302,8 @@ def generate_book_pdf(book_id: UUID, db: Session) -> Tuple[bytes, str]:
             section_number = f"{chapter.order}.{section.order}"
             story.append(Paragraph(f"{section_number} {section.title}", styles["section_title"]))
 
-            # Buscar assets da seção para substituir placeholders
-            assets: List[SectionAssets] = (
-                db.query(SectionAssets)
-                .filter(SectionAssets.section_id == section.id)
-                .order_by(SectionAssets.placeholder.asc())
-                .all()
-            )
-            assets_map = {a.placeholder: a for a in assets}
+            # Assets da seção (pré-carregados) para substituir placeholders
+            assets_map = {a.placeholder: a for a in section.assets}
 
             # Converter markdown em parágrafos
             paragraphs = _markdown_to_paragraphs(section.content_markdown)
@@ -415,8 +408,5 @@ def generate_book_pdf(book_id: UUID, db: Session) -> Tuple[bytes, str]:
 
     doc.build(story, onFirstPage=_footer, onLaterPages=_footer)
 
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-
-    logger.info(f"PDF gerado para o livro '{book.title}' ({len(pdf_bytes)} bytes)")
-    return pdf_bytes, book.title
+    logger.info(f"PDF gerado para o livro '{book.title}' ({output.tell() - start} bytes)")
+    return book.title
@@ -1,31 +1,39 @@
 """
 Celery Tasks - Transcription and Slide Processing
 """
-from celery_app import celery_app
-from database import get_db
+from celery.exceptions import Retry
+from celery_app import DispatchLockedTask, celery_app, decode_task_id
+from database import get_db, uuid7
 from models.books import Books
 from models.transcriptions import Transcription
 from models.slides import Slide
 from models.chapters import Chapters
-from models.sections import Sections
+from models.sections import Sections, section_references
 from models.global_references import GlobalReferences
 from models.section_assets import SectionAssets
-from services.gemini_service import generate_book_discovery, generate_section_content
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from services.gemini_service import (
+    generate_book_discovery, generate_section_content, generate_sections_content, is_quota_error
+)
 from services.image_extraction_service import extract_image_from_slide
+from utils.cache import DISPATCH_LOCK_TTL_SECONDS, hold_dispatch_lock
+import asyncio
 import os
+import re
 from uuid import UUID
 import logging
-from google.api_core import exceptions as google_exceptions
 
 logger = logging.getLogger(__name__)
 
-@celery_app.task(bind=True)
-def process_book_transcripts_task(self, book_id: str):
+@celery_app.task(bind=True, base=DispatchLockedTask)
+def process_book_transcripts_task(self, book_id: bytes):
     """
     Orchestrator Task:
     1. Runs Global Discovery to create the book skeleton.
     2. Stops after creating the structure (Review Phase).
     """
+    book_id = decode_task_id(book_id)
     db = next(get_db())
     try:
         book = db.query(Books).filter(Books.id == UUID(book_id)).first()
@@ -113,6 +121,7 @@ def process_book_transcripts_task(self, book_id: str):
                 
                 section = Sections(
                     chapter_id=chapter.id,
+                    book_id=chapter.book_id,
                     title=section_data["title"],
                     order=section_data["order"],
                     source_transcription_id=final_trans_id,
@@ -140,61 +149,331 @@ def process_book_transcripts_task(self, book_id: str):
     finally:
         db.close()
 
-@celery_app.task(bind=True)
-def process_book_content_sequential_task(self, book_id: str):
+def _save_section_content(db, section, chapter, book, slide, content_result):
     """
-    Sequential Orchestrator:
-    Finds the next PENDENTE section and triggers its processing.
+    Persists a generated section: numbers its references in the book's global
+    bibliography, replaces [REF:...] markers with [N], extracts slide assets and
+    marks the section SUCESSO. The caller commits.
+
+    Reference numbers follow the order in which sections are saved, so sections
+    of a book must be saved one at a time, in reading order.
+    """
+    # ========== PROCESS BIBLIOGRAPHY WITH GLOBAL NUMBERING ==========
+    # Phase A: Proactively save new references found in this section
+    markdown_content = content_result["content_markdown"]
+    is_bib_chapter = getattr(chapter, 'is_bibliography', False)
+    
+    cited_refs = {}  # ref_key -> ABNT text, in order of appearance
+    for bib_entry in content_result.get("bibliography_found", []):
+        raw_key = str(bib_entry["key"]).strip().upper()  # Normalize: Uppercase and trimmed
+        ref_key = raw_key if raw_key.startswith("REF:") else f"REF:{raw_key}" # Ensure REF: prefix
+        ref_text = bib_entry["full_reference"]  # ABNT formatted text
+        
+        # v6 FEATURE: CITATION FILTER
+        # Check if this marker is actually used in the text (unless it's the bibliography chapter)
+        # We look for the raw key without the "REF:" prefix in the marker search
+        search_key = raw_key[4:] if raw_key.startswith("REF:") else raw_key
+        marker_pattern = rf"\[\s*(?i:ref)\s*:\s*{re.escape(search_key)}\s*\]"
+        is_cited = re.search(marker_pattern, markdown_content)
+        
+        if not is_bib_chapter and not is_cited:
+            logger.info(f"Skipping reference {ref_key} - not cited in this section text.")
+            continue
+
+        cited_refs.setdefault(ref_key, ref_text)
+
+    if cited_refs:
+        # Resolve references that already exist in this book with a single SELECT
+        ref_ids = dict(db.execute(
+            select(GlobalReferences.reference_key, GlobalReferences.id).where(
+                GlobalReferences.book_id == book.id,
+                GlobalReferences.reference_key.in_(list(cited_refs))
+            )
+        ).all())
+
+        new_keys = [key for key in cited_refs if key not in ref_ids]
+        if new_keys:
+            # Create new references with the next sequential numbers in one roundtrip
+            max_number = db.query(func.max(GlobalReferences.reference_number)).filter(
+                GlobalReferences.book_id == book.id
+            ).scalar() or 0
+
+            stmt = pg_insert(GlobalReferences).values([
+                {
+                    "id": uuid7(),
+                    "book_id": book.id,
+                    "reference_key": key,
+                    "reference_number": max_number + offset,
+                    "full_reference_abnt": cited_refs[key],
+                }
+                for offset, key in enumerate(new_keys, start=1)
+            ]).on_conflict_do_nothing(
+                index_elements=["book_id", "reference_key"]
+            ).returning(GlobalReferences.id, GlobalReferences.reference_key)
+
+            for ref_id, key in db.execute(stmt):
+                ref_ids[key] = ref_id
+                logger.info(f"Created new global reference {key}")
+
+            # Keys inserted concurrently by another worker were skipped by ON CONFLICT
+            missing = [key for key in new_keys if key not in ref_ids]
+            if missing:
+                ref_ids.update(db.execute(
+                    select(GlobalReferences.reference_key, GlobalReferences.id).where(
+                        GlobalReferences.book_id == book.id,
+                        GlobalReferences.reference_key.in_(missing)
+                    )
+                ).all())
+
+        # Associate references with this section (many-to-many)
+        db.execute(
+            pg_insert(section_references).values([
+                {"section_id": section.id, "reference_id": ref_id}
+                for ref_id in ref_ids.values()
+            ]).on_conflict_do_nothing()
+        )
+    
+    # Phase B: Global Replacement Logic (Resilient)
+    # We fetch ALL references for this book to ensure any marker [REF:...] 
+    # is replaced, even if it was discovered in a previous section.
+    all_book_refs = db.query(GlobalReferences).filter(
+        GlobalReferences.book_id == book.id
+    ).all()
+    
+    global_ref_map = {r.reference_key: r.reference_number for r in all_book_refs}
+    
+    # Pattern matches [REF:KEY], [ ref: key ], [REF: KEY] etc.
+    ref_pattern = re.compile(r'\[\s*(?i:ref):([^\]]+)\]')
+    
+    def replace_ref_callback(match):
+        full_match = match.group(0) # e.g., "[REF:SILVA_2022]"
+        raw_key = match.group(1).strip().upper() # e.g., "SILVA_2022"
+        
+        # Try to match in global map
+        # We check both the raw_key and "REF:"+raw_key to be extra safe
+        lookup_key = raw_key if raw_key.startswith("REF:") else f"REF:{raw_key}"
+        
+        if lookup_key in global_ref_map:
+            num = global_ref_map[lookup_key]
+            logger.info(f"Replaced {full_match} with [{num}] using global map")
+            return f"[{num}]"
+        else:
+            logger.warning(f"Found placeholder {full_match} but key '{lookup_key}' not found in global references for book {book.id}")
+            return full_match # Keep original marker for troubleshooting instead of deleting
+    
+    final_markdown = ref_pattern.sub(replace_ref_callback, markdown_content)
+    section.status = "SUCESSO"
+    
+    # ========== SAVE ASSETS (SLIDES) AND EXTRACT IMAGES ==========
+    success_placeholders = []
+    asset_rows = []
+    for asset_data in content_result.get("section_assets", []):
+        try:
+            # Early check for required crop data
+            if not asset_data.get("crop_info") or not asset_data.get("slide_page"):
+                logger.warning(f"Skipping asset {asset_data.get('placeholder')} due to missing crop/page info")
+                continue
+
+            # Perform extraction
+            extracted_path = extract_image_from_slide(
+                pdf_path=slide.storage_path,
+                page_number=asset_data["slide_page"],
+                crop_info=asset_data["crop_info"],
+                user_id=book.author_profile_id,
+                book_id=book.id,
+                placeholder=asset_data["placeholder"],
+                section_id=section.id
+            )
+
+            asset_rows.append(dict(
+                section_id=section.id,
+                placeholder=asset_data["placeholder"],
+                caption=asset_data["caption"],
+                source_type='SLIDE',
+                timestamp=None,
+                slide_page=asset_data.get("slide_page"),
+                storage_path=extracted_path,
+                crop_info=asset_data["crop_info"]
+            ))
+            success_placeholders.append(asset_data["placeholder"])
+            logger.info(f"Asset extracted and saved: {asset_data['placeholder']} -> {extracted_path}")
+        except Exception as e:
+            logger.error(f"Failed to extract asset {asset_data.get('placeholder')}: {e}. Skipping.")
+            continue
+
+    # Persist all extracted assets with a single bulk INSERT
+    if asset_rows:
+        db.execute(insert(SectionAssets), asset_rows)
+
+    # Sync markdown: remove placeholders for which extraction failed
+    all_placeholders = re.findall(r"\[IMAGE_\d+\]", final_markdown)
+    for p in all_placeholders:
+        if p not in success_placeholders:
+            logger.warning(f"Removing placeholder {p} from markdown because extraction failed")
+            # Remove placeholder with surrounding whitespace/newlines
+            final_markdown = re.sub(rf"\n*\s*{re.escape(p)}\s*\n*", "\n\n", final_markdown)
+    
+    section.content_markdown = final_markdown.strip()
+
+
+def _generate_pending_sections(db, book, sections):
+    """
+    Generates every pending section of a book concurrently (generate_sections_content)
+    and then saves them one by one in reading order, committing after each.
+
+    Returns (quota_error, failed_ids). Saving stops at the first section that
+    hit the Gemini quota: it and every later section go back to PENDENTE for
+    the orchestrator's retry. Other failures are ERRO and roll back only
+    their own section.
+    """
+    sources = []
+    for section in sections:
+        transcript = db.query(Transcription).filter(Transcription.id == section.source_transcription_id).first()
+        slide = db.query(Slide).filter(Slide.id == section.source_slide_id).first() if section.source_slide_id else None
+        sources.append((transcript, slide))
+        section.status = "PROCESSANDO"
+
+    book.status = "PROCESSANDO"
+    book.current_step = f"Gerando {len(sections)} seções..."
+    db.commit()
+
+    results = asyncio.run(generate_sections_content([
+        dict(
+            section_title=section.title,
+            chapter_title=section.chapter.title,
+            transcript_path=transcript.storage_path,
+            slide_path=slide.storage_path if slide else None
+        )
+        for section, (transcript, slide) in zip(sections, sources)
+    ]))
+
+    total_sections = db.query(func.count(Sections.id)).filter(Sections.book_id == book.id).scalar()
+    completed_count = total_sections - len(sections)
+    quota_error = None
+    failed = []
+    for index, (section, (transcript, slide), result) in enumerate(zip(sections, sources, results)):
+        if is_quota_error(result):
+            # Saving later sections first would break the reading-order numbering:
+            # stop here and leave this section and the rest for the retry
+            logger.warning(f"Quota exceeded for section {section.id}; {len(sections) - index} section(s) stay pending")
+            quota_error = result
+            for remaining in sections[index:]:
+                remaining.status = "PENDENTE"
+            db.commit()
+            break
+        if isinstance(result, BaseException):
+            logger.error(f"Error generating section {section.id}: {result}")
+            failed.append(str(section.id))
+            section.status = "ERRO"
+            db.commit()
+            continue
+
+        try:
+            _save_section_content(db, section, section.chapter, book, slide, result)
+            book.processing_progress = 10 + int(((completed_count + 1) / total_sections) * 90)
+            # Deferred constraints (uq_book_reference_number) are checked here
+            db.commit()
+        except Exception:
+            logger.exception(f"Error saving section {section.id}")
+            db.rollback()
+            failed.append(str(section.id))
+            section.status = "ERRO"
+            db.commit()
+            continue
+
+        completed_count += 1
+        logger.info(f"Section {section.id} processed successfully")
+
+    return quota_error, failed
+
+
+@celery_app.task(bind=True, base=DispatchLockedTask, max_retries=10)
+def process_book_content_sequential_task(self, book_id: bytes):
+    """
+    Content Orchestrator:
+    1. Generates all PENDENTE sections concurrently (capped by GEMINI_SECTION_CONCURRENCY).
+    2. Saves them in reading order so global reference numbers stay sequential.
+    3. Builds the bibliography chapter once no section is left.
     """
+    book_id = decode_task_id(book_id)
     db = next(get_db())
     try:
-        # Find next pending section for this book
-        section = db.query(Sections).join(Chapters).filter(
-            Chapters.book_id == UUID(book_id),
+        # All pending sections of this book, in reading order
+        pending_sections = db.query(Sections).join(Chapters).filter(
+            Sections.book_id == UUID(book_id),
             Sections.status == "PENDENTE"
-        ).order_by(Chapters.order, Sections.order).first()
+        ).order_by(Chapters.order, Sections.order).all()
 
         book = db.query(Books).filter(Books.id == UUID(book_id)).first()
         if not book: return
 
-        if not section:
-            # All content sections done — generate bibliography chapter
-            from sqlalchemy import func as sqlfunc
-
-            # Check if a bibliography chapter already exists
-            bib_chapter = db.query(Chapters).filter(
-                Chapters.book_id == UUID(book_id),
-                Chapters.is_bibliography == True
-            ).first()
-
-            refs = db.query(GlobalReferences).filter(
-                GlobalReferences.book_id == UUID(book_id)
-            ).order_by(GlobalReferences.reference_number.asc()).all()
-
-            if refs:
-                # Build bibliography markdown
-                bib_lines = []
-                for ref in refs:
-                    bib_lines.append(f"[{ref.reference_number}] {ref.full_reference_abnt}")
-                bib_markdown = "\n\n".join(bib_lines)
-
-                if not bib_chapter:
-                    # Determine order for bibliography (after all regular chapters)
-                    max_order = db.query(sqlfunc.max(Chapters.order)).filter(
-                        Chapters.book_id == UUID(book_id)
-                    ).scalar() or 0
-
-                    bib_chapter = Chapters(
-                        book_id=UUID(book_id),
-                        title="Referências",
-                        order=max_order + 1,
-                        is_bibliography=True
-                    )
-                    db.add(bib_chapter)
-                    db.flush()
+        if pending_sections:
+            quota_error, failed = _generate_pending_sections(db, book, pending_sections)
+            if quota_error is not None:
+                # Use a longer delay for quota issues to avoid constant polling;
+                # keep the dispatch lock until the retry has run
+                hold_dispatch_lock(self.name, book_id, 60 + DISPATCH_LOCK_TTL_SECONDS)
+                raise self.retry(exc=quota_error, countdown=60)
+            if failed:
+                book.status = "ERRO"
+                db.commit()
+                return {"status": "Sections failed", "failed_sections": failed}
+
+        # All content sections done — generate bibliography chapter
+        # Check if a bibliography chapter already exists
+        bib_chapter = db.query(Chapters).filter(
+            Chapters.book_id == UUID(book_id),
+            Chapters.is_bibliography == True
+        ).first()
+
+        refs = db.query(GlobalReferences).filter(
+            GlobalReferences.book_id == UUID(book_id)
+        ).order_by(GlobalReferences.reference_number.asc()).all()
+
+        if refs:
+            # Build bibliography markdown
+            bib_lines = []
+            for ref in refs:
+                bib_lines.append(f"[{ref.reference_number}] {ref.full_reference_abnt}")
+            bib_markdown = "\n\n".join(bib_lines)
+
+            if not bib_chapter:
+                # Determine order for bibliography (after all regular chapters)
+                max_order = db.query(func.max(Chapters.order)).filter(
+                    Chapters.book_id == UUID(book_id)
+                ).scalar() or 0
 
+                bib_chapter = Chapters(
+                    book_id=UUID(book_id),
+                    title="Referências",
+                    order=max_order + 1,
+                    is_bibliography=True
+                )
+                db.add(bib_chapter)
+                db.flush()
+
+                bib_section = Sections(
+                    chapter_id=bib_chapter.id,
+                    book_id=bib_chapter.book_id,
+                    title="Lista de Referências",
+                    order=1,
+                    start_time=0.0,
+                    end_time=0.0,
+                    content_markdown=bib_markdown,
+                    status="SUCESSO"
+                )
+                db.add(bib_section)
+            else:
+                # Update existing bibliography section
+                existing_bib_section = db.query(Sections).filter(
+                    Sections.chapter_id == bib_chapter.id
+                ).first()
+                if existing_bib_section:
+                    existing_bib_section.content_markdown = bib_markdown
+                else:
                     bib_section = Sections(
                         chapter_id=bib_chapter.id,
+                        book_id=bib_chapter.book_id,
                         title="Lista de Referências",
                         order=1,
                         start_time=0.0,
@@ -203,51 +482,17 @@ def process_book_content_sequential_task(self, book_id: str):
                         status="SUCESSO"
                     )
                     db.add(bib_section)
-                else:
-                    # Update existing bibliography section
-                    existing_bib_section = db.query(Sections).filter(
-                        Sections.chapter_id == bib_chapter.id
-                    ).first()
-                    if existing_bib_section:
-                        existing_bib_section.content_markdown = bib_markdown
-                    else:
-                        bib_section = Sections(
-                            chapter_id=bib_chapter.id,
-                            title="Lista de Referências",
-                            order=1,
-                            start_time=0.0,
-                            end_time=0.0,
-                            content_markdown=bib_markdown,
-                            status="SUCESSO"
-                        )
-                        db.add(bib_section)
-
-                logger.info(f"Bibliography chapter generated for book {book_id} with {len(refs)} references")
-
-            book.status = "CONCLUIDO"
-            book.current_step = "Livro gerado com sucesso!"
-            book.processing_progress = 100
-            db.commit()
-            return {"status": "All sections completed"}
 
-        # Update progress
-        all_sections = db.query(Sections).join(Chapters).filter(Chapters.book_id == UUID(book_id)).all()
-        completed_count = sum(1 for s in all_sections if s.status == "SUCESSO")
-        progress = 10 + int((completed_count / len(all_sections)) * 90)
-        
-        # Garante que a mensagem caiba nos 50 caracteres (prefixo/sufixo usam ~20-25 caracteres)
-        display_title = section.title
-        if len(display_title) > 20:
-            display_title = display_title[:17] + "..."
-            
-        book.status = "PROCESSANDO"
-        book.current_step = f"Gerando: {display_title} ({completed_count + 1}/{len(all_sections)})"
-        book.processing_progress = progress
+            logger.info(f"Bibliography chapter generated for book {book_id} with {len(refs)} references")
+
+        book.status = "CONCLUIDO"
+        book.current_step = "Livro gerado com sucesso!"
+        book.processing_progress = 100
         db.commit()
+        return {"status": "All sections completed"}
 
-        # Trigger section task
-        process_section_content_task.delay(str(section.id), trigger_next=True)
-        return {"status": "Processing section", "section_id": str(section.id)}
+    except Retry:
+        raise
 
     except Exception as e:
         logger.exception(f"Error in sequential orchestrator for book {book_id}")
@@ -255,8 +500,9 @@ def process_book_content_sequential_task(self, book_id: str):
     finally:
         db.close()
 
+
 @celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=10)
-def process_section_content_task(self, section_id: str, trigger_next: bool = True):
+def process_section_content_task(self, section_id: bytes, trigger_next: bool = True):
     """
     Individual Section Task:
     1. Calls Gemini Flash for the specific section content.
@@ -265,6 +511,7 @@ def process_section_content_task(self, section_id: str, trigger_next: bool = Tru
     4. Saves Markdown, assets, and references.
     5. Re-triggers sequential orchestrator.
     """
+    section_id = decode_task_id(section_id)
     db = next(get_db())
     try:
         section = db.query(Sections).filter(Sections.id == UUID(section_id)).first()
@@ -282,10 +529,6 @@ def process_section_content_task(self, section_id: str, trigger_next: bool = Tru
         slide = db.query(Slide).filter(Slide.id == section.source_slide_id).first() if section.source_slide_id else None
 
         # Phase 2: Deep Analysis
-        import asyncio
-        from models.global_references import GlobalReferences
-        from sqlalchemy import func
-        
         content_result = asyncio.run(generate_section_content(
             section_title=section.title,
             chapter_title=chapter.title,
@@ -293,157 +536,23 @@ def process_section_content_task(self, section_id: str, trigger_next: bool = Tru
             slide_path=slide.storage_path if slide else None
         ))
 
-        # ========== PROCESS BIBLIOGRAPHY WITH GLOBAL NUMBERING ==========
-        # Phase A: Proactively save new references found in this section
-        import re
-        markdown_content = content_result["content_markdown"]
-        is_bib_chapter = getattr(chapter, 'is_bibliography', False)
-        
-        for bib_entry in content_result.get("bibliography_found", []):
-            raw_key = str(bib_entry["key"]).strip().upper()  # Normalize: Uppercase and trimmed
-            ref_key = raw_key if raw_key.startswith("REF:") else f"REF:{raw_key}" # Ensure REF: prefix
-            ref_text = bib_entry["full_reference"]  # ABNT formatted text
-            
-            # v6 FEATURE: CITATION FILTER
-            # Check if this marker is actually used in the text (unless it's the bibliography chapter)
-            # We look for the raw key without the "REF:" prefix in the marker search
-            search_key = raw_key[4:] if raw_key.startswith("REF:") else raw_key
-            marker_pattern = rf"\[\s*(?i:ref)\s*:\s*{re.escape(search_key)}\s*\]"
-            is_cited = re.search(marker_pattern, markdown_content)
-            
-            if not is_bib_chapter and not is_cited:
-                logger.info(f"Skipping reference {ref_key} - not cited in this section text.")
-                continue
-
-            # Check if reference already exists in this book
-            existing_ref = db.query(GlobalReferences).filter(
-                GlobalReferences.book_id == book.id,
-                GlobalReferences.reference_key == ref_key
-            ).first()
-            
-            if existing_ref:
-                logger.info(f"Reference already exists: {ref_key}")
-                ref_obj = existing_ref
-            else:
-                # Create new reference with next sequential number
-                max_number = db.query(func.max(GlobalReferences.reference_number)).filter(
-                    GlobalReferences.book_id == book.id
-                ).scalar() or 0
-                
-                new_ref = GlobalReferences(
-                    book_id=book.id,
-                    reference_key=ref_key,
-                    reference_number=max_number + 1,
-                    full_reference_abnt=ref_text
-                )
-                db.add(new_ref)
-                db.flush()  # Get the ID
-                ref_obj = new_ref
-                logger.info(f"Created new global reference {ref_key} as [{new_ref.reference_number}]")
-            
-            # Associate reference with this section (many-to-many)
-            if ref_obj not in section.references:
-                section.references.append(ref_obj)
-        
-        # Phase B: Global Replacement Logic (Resilient)
-        # We fetch ALL references for this book to ensure any marker [REF:...] 
-        # is replaced, even if it was discovered in a previous section.
-        all_book_refs = db.query(GlobalReferences).filter(
-            GlobalReferences.book_id == book.id
-        ).all()
-        
-        global_ref_map = {r.reference_key: r.reference_number for r in all_book_refs}
-        
-        import re
-        markdown_content = content_result["content_markdown"]
-        
-        # Pattern matches [REF:KEY], [ ref: key ], [REF: KEY] etc.
-        ref_pattern = re.compile(r'\[\s*(?i:ref):([^\]]+)\]')
-        
-        def replace_ref_callback(match):
-            full_match = match.group(0) # e.g., "[REF:SILVA_2022]"
-            raw_key = match.group(1).strip().upper() # e.g., "SILVA_2022"
-            
-            # Try to match in global map
-            # We check both the raw_key and "REF:"+raw_key to be extra safe
-            lookup_key = raw_key if raw_key.startswith("REF:") else f"REF:{raw_key}"
-            
-            if lookup_key in global_ref_map:
-                num = global_ref_map[lookup_key]
-                logger.info(f"Replaced {full_match} with [{num}] using global map")
-                return f"[{num}]"
-            else:
-                logger.warning(f"Found placeholder {full_match} but key '{lookup_key}' not found in global references for book {book.id}")
-                return full_match # Keep original marker for troubleshooting instead of deleting
-        
-        final_markdown = ref_pattern.sub(replace_ref_callback, markdown_content)
-        section.content_markdown = final_markdown
-        section.status = "SUCESSO"
-        
-        # ========== SAVE ASSETS (SLIDES) AND EXTRACT IMAGES ==========
-        import re
-        success_placeholders = []
-        for asset_data in content_result.get("section_assets", []):
-            try:
-                # Early check for required crop data
-                if not asset_data.get("crop_info") or not asset_data.get("slide_page"):
-                    logger.warning(f"Skipping asset {asset_data.get('placeholder')} due to missing crop/page info")
-                    continue
-
-                # Perform extraction
-                extracted_path = extract_image_from_slide(
-                    pdf_path=slide.storage_path,
-                    page_number=asset_data["slide_page"],
-                    crop_info=asset_data["crop_info"],
-                    user_id=book.author_profile_id,
-                    book_id=book.id,
-                    placeholder=asset_data["placeholder"],
-                    section_id=section.id
-                )
-
-                asset = SectionAssets(
-                    section_id=section.id,
-                    placeholder=asset_data["placeholder"],
-                    caption=asset_data["caption"],
-                    source_type='SLIDE',
-                    timestamp=None,
-                    slide_page=asset_data.get("slide_page"),
-                    storage_path=extracted_path,
-                    crop_info=asset_data["crop_info"]
-                )
-                db.add(asset)
-                success_placeholders.append(asset_data["placeholder"])
-                logger.info(f"Asset extracted and saved: {asset_data['placeholder']} -> {extracted_path}")
-            except Exception as e:
-                logger.error(f"Failed to extract asset {asset_data.get('placeholder')}: {e}. Skipping.")
-                continue
-
-        # Sync markdown: remove placeholders for which extraction failed
-        final_markdown = section.content_markdown
-        all_placeholders = re.findall(r"\[IMAGE_\d+\]", final_markdown)
-        for p in all_placeholders:
-            if p not in success_placeholders:
-                logger.warning(f"Removing placeholder {p} from markdown because extraction failed")
-                # Remove placeholder with surrounding whitespace/newlines
-                final_markdown = re.sub(rf"\n*\s*{re.escape(p)}\s*\n*", "\n\n", final_markdown)
-        
-        section.content_markdown = final_markdown.strip()
+        _save_section_content(db, section, chapter, book, slide, content_result)
 
         db.commit()
         logger.info(f"Section {section_id} processed successfully")
         
         # Trigger next section if requested
         if trigger_next:
-            process_book_content_sequential_task.delay(str(book.id))
+            process_book_content_sequential_task.delay(book.id.bytes)
 
         return {"status": "Section complete", "section_id": section_id}
 
-    except google_exceptions.ResourceExhausted as e:
-        logger.warning(f"Quota exceeded for section {section_id}. Retrying with backoff...")
-        # Use a longer delay for quota issues to avoid constant polling
-        raise self.retry(exc=e, countdown=60)  # Wait at least 1 minute on quota error
-
     except Exception as e:
+        if is_quota_error(e):
+            logger.warning(f"Quota exceeded for section {section_id}. Retrying with backoff...")
+            # Use a longer delay for quota issues to avoid constant polling
+            raise self.retry(exc=e, countdown=60)  # Wait at least 1 minute on quota error
+
         logger.exception(f"Error in section task {section_id}")
         section = db.query(Sections).filter(Sections.id == UUID(section_id)).first()
         if section:
@@ -1,21 +1,21 @@
 """
 Celery Tasks - Video Processing
 """
-from celery_app import celery_app
+from celery_app import celery_app, decode_task_id
 from database import get_db
 from models.books import Books
 from models.videos import Videos
 from models.chapters import Chapters
 from models.sections import Sections
-from utils.ffmpeg_utils import extract_audio_from_video
-from utils.gemini_utils import upload_audio_to_gemini, call_gemini_discovery
+from utils.ffmpeg_utils import extract_audio_from_video, get_video_duration
+from utils.gemini_utils import upload_audios_to_gemini, call_gemini_discovery
 import os
 import shutil
 from uuid import UUID
 
 
 @celery_app.task(bind=True)
-def process_book_videos(self, book_id: str):
+def process_book_videos(self, book_id: bytes):
     """
     Task principal: processa todos os vídeos de um livro.
     
@@ -39,6 +39,7 @@ def process_book_videos(self, book_id: str):
     Returns:
         Dict com status e book_id
     """
+    book_id = decode_task_id(book_id)
     db = next(get_db())
     temp_audio_dir = None
     
@@ -108,27 +109,30 @@ def process_book_videos(self, book_id: str):
         book.current_step = "Enviando áudios para análise"
         db.commit()
         
-        gemini_files = []
-        
-        for idx, extraction in enumerate(audio_extractions, 1):
-            print(f"[Task] Upload {idx}/{len(audio_extractions)} para Gemini File API")
-            
-            file_name = upload_audio_to_gemini(
-                audio_path=extraction["audio_path"],
-                display_name=extraction["video_id"]  # UUID como display_name
-            )
-            
-            gemini_files.append({
-                "video_id": extraction["video_id"],
-                "file_name": file_name
-            })
-            
+        def _upload_progress(done: int) -> None:
             # Atualizar progresso (30-60% para upload)
-            progress = 30 + int((idx / len(audio_extractions)) * 30)
+            progress = 30 + int((done / len(audio_extractions)) * 30)
             book.processing_progress = progress
             db.commit()
-            
-            print(f"[Task] Upload concluído: {file_name} (Progresso: {progress}%)")
+            print(f"[Task] Upload {done}/{len(audio_extractions)} enviado (Progresso: {progress}%)")
+        
+        # Todos os áudios são enviados antes de esperar o processamento, que
+        # é acompanhado numa única consulta compartilhada
+        file_names = upload_audios_to_gemini(
+            [
+                {
+                    "audio_path": extraction["audio_path"],
+                    "display_name": extraction["video_id"]  # UUID como display_name
+                }
+                for extraction in audio_extractions
+            ],
+            on_uploaded=_upload_progress
+        )
+        
+        gemini_files = [
+            {"video_id": extraction["video_id"], "file_name": file_name}
+            for extraction, file_name in zip(audio_extractions, file_names)
+        ]
         
         print(f"[Task] Todos os uploads concluídos")
         
@@ -165,6 +169,7 @@ def process_book_videos(self, book_id: str):
             for section_data in chapter_data["sections"]:
                 section = Sections(
                     chapter_id=chapter.id,
+                    book_id=chapter.book_id,
                     video_id=UUID(section_data["video_id"]),
                     title=section_data["title"],
                     order=section_data["order"],
@@ -223,3 +228,47 @@ def process_book_videos(self, book_id: str):
         
     finally:
         db.close()
+
+
+@celery_app.task(bind=True)
+def process_video(self, video_id: bytes, upload_path: str):
+    """
+    Task pós-upload: processa um único vídeo já salvo em disco.
+    
+    O endpoint de upload apenas grava o arquivo e enfileira esta task,
+    retornando imediatamente; o trabalho pesado (ffprobe) roda no worker.
+    A duração é calculada uma única vez e persistida em Videos.duration;
+    leituras posteriores usam o valor do banco.
+    
+    Args:
+        video_id: UUID do vídeo
+        upload_path: Caminho do arquivo salvo pelo endpoint de upload
+    
+    Returns:
+        Dict com video_id e duração calculada
+    """
+    video_id = decode_task_id(video_id)
+    db = next(get_db())
+    
+    try:
+        video = db.query(Videos).filter(Videos.id == UUID(video_id)).first()
+        if not video:
+            raise Exception(f"Vídeo {video_id} não encontrado")
+        
+        # Duração já persistida (task reentregue ou reenfileirada): não roda ffprobe de novo
+        if video.duration:
+            print(f"[Task] Duração do vídeo {video_id} já calculada: {video.duration:.1f}s")
+            return {"video_id": video_id, "duration": video.duration}
+        
+        duration = get_video_duration(upload_path)
+        if duration is not None:
+            video.duration = duration
+            db.commit()
+            print(f"[Task] Duração do vídeo {video_id}: {duration:.1f}s")
+        else:
+            print(f"[Task] Não foi possível obter a duração do vídeo {video_id}")
+        
+        return {"video_id": video_id, "duration": duration}
+        
+    finally:
+        db.close()
@@ -0,0 +1,39 @@
+"""
+Body Limit - ASGI middleware rejecting oversized requests from Content-Length
+"""
+import os
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+# Largest accepted request body: a 2GB video plus multipart framing.
+# Routes still enforce their own, tighter limits while reading the body.
+MAX_REQUEST_BODY_SIZE = int(os.getenv("MAX_REQUEST_BODY_SIZE", str(2 * 1024 * 1024 * 1024 + 64 * 1024)))
+
+
+class BodySizeLimitMiddleware:
+    """
+    Answer 413 before any of the body is received when the declared
+    Content-Length exceeds max_body_size, so an oversized upload is not
+    spooled to /tmp (or streamed to disk) only to be rejected afterwards.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int = MAX_REQUEST_BODY_SIZE):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_body_size:
+                        response = JSONResponse(
+                            {"detail": "Requisição muito grande"},
+                            status_code=413,
+                            headers={"Connection": "close"}
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
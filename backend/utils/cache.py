@@ -0,0 +1,142 @@
+"""
+Cache Utilities - Two-level cache (in-process TTL LRU + Redis)
+"""
+import os
+import threading
+from typing import Any, Optional
+
+import orjson
+import redis
+from cachetools import TTLCache
+
+
+REDIS_URL = os.getenv("REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+
+# Gemini keeps uploaded files for 48 hours; expire cache entries a bit earlier
+# so a cached URI is never handed out for a file that is about to disappear.
+GEMINI_UPLOAD_CACHE_TTL_SECONDS = 47 * 60 * 60
+
+# Gemini context caches for section generation live 1 hour; expire our pointer
+# to them earlier so a cache name is never handed out just before it disappears.
+GEMINI_SECTION_CONTEXT_TTL_SECONDS = 55 * 60
+
+# Double-submit guard for task dispatch; released when the task returns
+DISPATCH_LOCK_TTL_SECONDS = 30
+
+_redis_client: Optional[redis.Redis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return the process-wide Redis client, creating it on first use.
+    The client keeps its own connection pool and is safe to share between threads.
+    """
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(
+                    REDIS_URL,
+                    socket_connect_timeout=1,
+                    socket_timeout=1
+                )
+    return _redis_client
+
+
+def _dispatch_lock_key(task_name: str, object_id: str) -> str:
+    return f"lock:dispatch:{task_name}:{object_id}"
+
+
+def acquire_dispatch_lock(task_name: str, object_id: str, ttl_seconds: int = DISPATCH_LOCK_TTL_SECONDS) -> bool:
+    """
+    SET NX a short-lived lock for (task, object). Returns False if one is held.
+    Redis failures are logged and treated as acquired, so dispatch never
+    depends on Redis being up.
+    """
+    try:
+        return bool(get_redis().set(_dispatch_lock_key(task_name, object_id), "1", nx=True, ex=ttl_seconds))
+    except redis.RedisError as e:
+        print(f"Warning: dispatch lock unavailable for {task_name}: {e}")
+        return True
+
+
+def hold_dispatch_lock(task_name: str, object_id: str, ttl_seconds: int) -> None:
+    """
+    (Re)set the lock for (task, object) unconditionally, e.g. to keep it held
+    while a task waits for its retry.
+    """
+    try:
+        get_redis().set(_dispatch_lock_key(task_name, object_id), "1", ex=ttl_seconds)
+    except redis.RedisError as e:
+        print(f"Warning: dispatch lock hold failed for {task_name}: {e}")
+
+
+def release_dispatch_lock(task_name: str, object_id: str) -> None:
+    try:
+        get_redis().delete(_dispatch_lock_key(task_name, object_id))
+    except redis.RedisError as e:
+        print(f"Warning: dispatch lock release failed for {task_name}: {e}")
+
+
+class TwoLevelCache:
+    """
+    Read-through cache with an in-process TTL LRU (L1) in front of Redis (L2).
+
+    Values must be JSON serializable (stored as compact orjson bytes). Redis failures are logged and treated
+    as misses, so the cache never breaks the caller's main path.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: int, l1_maxsize: int = 1024):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._l1 = TTLCache(maxsize=l1_maxsize, ttl=ttl_seconds)
+        self._l1_lock = threading.Lock()
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._l1_lock:
+            value = self._l1.get(key)
+        if value is not None:
+            return value
+
+        try:
+            raw = get_redis().get(self._key(key))
+        except redis.RedisError as e:
+            print(f"Warning: cache read failed for {self.namespace}: {e}")
+            return None
+        if raw is None:
+            return None
+
+        value = orjson.loads(raw)
+        with self._l1_lock:
+            self._l1[key] = value
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._l1_lock:
+            self._l1[key] = value
+        try:
+            get_redis().set(self._key(key), orjson.dumps(value), ex=self.ttl_seconds)
+        except redis.RedisError as e:
+            print(f"Warning: cache write failed for {self.namespace}: {e}")
+
+    def delete(self, key: str) -> None:
+        with self._l1_lock:
+            self._l1.pop(key, None)
+        try:
+            get_redis().delete(self._key(key))
+        except redis.RedisError as e:
+            print(f"Warning: cache delete failed for {self.namespace}: {e}")
+
+
+# Gemini File API uploads of stored PDFs keyed by SHA-256 of the content -> [uri, mime_type]
+gemini_file_cache = TwoLevelCache("gemini:file", GEMINI_UPLOAD_CACHE_TTL_SECONDS)
+
+# Audio uploads of the video pipeline keyed by SHA-256 of the content -> Gemini file name
+gemini_audio_upload_cache = TwoLevelCache("gemini:audio_upload", GEMINI_UPLOAD_CACHE_TTL_SECONDS)
+
+# (transcript path, slide path) -> name of the Gemini cached content for section generation
+gemini_section_context_cache = TwoLevelCache("gemini:section_context", GEMINI_SECTION_CONTEXT_TTL_SECONDS)
@@ -0,0 +1,191 @@
+"""
+File Utilities - Blocking file helpers meant to run in a worker thread
+"""
+import io
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, Optional
+
+from cachetools import LRUCache
+
+
+COPY_BUFFER_SIZE = 8 * 1024 * 1024  # 8 MiB
+SENDFILE_CHUNK_SIZE = 1 << 20  # 1 MiB per sendfile() call
+
+# Reusable copy buffers for save_upload's in-memory path, so concurrent uploads
+# don't allocate (and free) a fresh buffer_size bytes object per read
+_copy_buffers: "queue.SimpleQueue[bytearray]" = queue.SimpleQueue()
+
+# Directories this process already created or saw; skips the makedirs syscalls
+# on repeat uploads. Entries are dropped by remove_tree and on open() misses;
+# the LRU bound keeps a long-running worker from growing it without limit.
+KNOWN_DIRS_MAXSIZE = 4096
+_known_dirs: LRUCache = LRUCache(maxsize=KNOWN_DIRS_MAXSIZE)
+_known_dirs_lock = threading.Lock()
+
+
+def ensure_dir(path: str) -> None:
+    """
+    Create a directory (and parents) unless this process already knows it exists.
+    """
+    with _known_dirs_lock:
+        if _known_dirs.get(path) is not None:
+            return
+    os.makedirs(path, exist_ok=True)
+    with _known_dirs_lock:
+        _known_dirs[path] = True
+
+
+def forget_dir(path: str) -> None:
+    """
+    Drop path and every cached directory below it from the ensure_dir cache.
+    """
+    prefix = os.path.join(path, "")
+    with _known_dirs_lock:
+        for known in [d for d in _known_dirs if d == path or d.startswith(prefix)]:
+            del _known_dirs[known]
+
+
+def _disk_fileno(src: BinaryIO) -> Optional[int]:
+    """
+    Return the OS file descriptor behind src, or None if its data only lives
+    in memory. Never forces a SpooledTemporaryFile to roll over to disk.
+    """
+    if isinstance(src, tempfile.SpooledTemporaryFile):
+        if not src._rolled:
+            return None
+        src = src._file
+    try:
+        return src.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _take_copy_buffer(size: int) -> bytearray:
+    """
+    Take a pooled buffer of at least `size` bytes, allocating one if none fits.
+    Return it with _copy_buffers.put() when done.
+    """
+    try:
+        copy_buffer = _copy_buffers.get_nowait()
+    except queue.Empty:
+        return bytearray(size)
+    if len(copy_buffer) < size:
+        return bytearray(size)
+    return copy_buffer
+
+
+class FileTooLargeError(Exception):
+    """Raised by save_upload when the source exceeds max_size bytes."""
+
+
+def save_upload(
+    src: BinaryIO,
+    dest_path: str,
+    buffer_size: int = COPY_BUFFER_SIZE,
+    max_size: Optional[int] = None
+) -> int:
+    """
+    Copy an uploaded file object to dest_path, creating parent directories.
+    Returns the number of bytes written.
+    
+    Blocking: call it through run_in_threadpool from async routes.
+    
+    Uploads that were spooled to disk are copied in-kernel with os.sendfile;
+    in-memory uploads are copied with readinto() through a pooled buffer.
+    
+    With max_size, the copy stops as soon as more than max_size bytes were
+    written; the partial file is removed and FileTooLargeError is raised.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    ensure_dir(dest_dir)
+    src_fd = _disk_fileno(src) if hasattr(os, "sendfile") else None
+    # Read at most one byte past the cap, enough to tell that it was exceeded
+    limit = max_size + 1 if max_size is not None else None
+    try:
+        buffer = open(dest_path, "wb")
+    except FileNotFoundError:
+        # Directory was removed behind the cache's back
+        forget_dir(dest_dir)
+        ensure_dir(dest_dir)
+        buffer = open(dest_path, "wb")
+    written = 0
+    with buffer:
+        if src_fd is None:
+            copy_buffer = _take_copy_buffer(buffer_size)
+            try:
+                with memoryview(copy_buffer) as view:
+                    while written != limit:
+                        chunk_size = buffer_size if limit is None else min(buffer_size, limit - written)
+                        n = src.readinto(view[:chunk_size])
+                        if not n:
+                            break
+                        written += buffer.write(view[:n])
+            finally:
+                _copy_buffers.put(copy_buffer)
+        else:
+            src.flush()
+            offset = src.tell()
+            while written != limit:
+                chunk_size = SENDFILE_CHUNK_SIZE if limit is None else min(SENDFILE_CHUNK_SIZE, limit - written)
+                sent = os.sendfile(buffer.fileno(), src_fd, offset + written, chunk_size)
+                if not sent:
+                    break
+                written += sent
+            src.seek(offset + written)
+    
+    if max_size is not None and written > max_size:
+        remove_file(dest_path)
+        raise FileTooLargeError(f"{dest_path}: upload exceeds {max_size} bytes")
+    return written
+
+
+def move_file(src_path: str, dest_path: str) -> None:
+    """
+    Move a file within the same filesystem (a rename, no data copy),
+    creating the destination's parent directories.
+    
+    Blocking: call it through run_in_threadpool from async routes.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    ensure_dir(dest_dir)
+    try:
+        os.replace(src_path, dest_path)
+    except FileNotFoundError:
+        if not os.path.exists(src_path):
+            raise
+        # Directory was removed behind the cache's back
+        forget_dir(dest_dir)
+        ensure_dir(dest_dir)
+        os.replace(src_path, dest_path)
+
+
+def remove_file(path: str) -> bool:
+    """
+    Remove a file if it exists. Returns True if a file was removed.
+    
+    Blocking: call it through run_in_threadpool from async routes.
+    Raises OSError for failures other than the file being missing.
+    """
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def remove_tree(path: str) -> bool:
+    """
+    Recursively remove a directory if it exists. Returns True if it was removed.
+    
+    Blocking: call it through run_in_threadpool from async routes.
+    """
+    forget_dir(path)
+    try:
+        shutil.rmtree(path)
+        return True
+    except FileNotFoundError:
+        return False
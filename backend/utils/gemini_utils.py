@@ -2,10 +2,22 @@
 Gemini API Utilities - File upload and Discovery phase execution
 """
 import google.generativeai as genai
+import functools
+import hashlib
 import os
+import random
 import time
-import json
-from typing import List, Dict, Any
+import orjson
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from utils.cache import gemini_audio_upload_cache
+
+
+# Espera pelo processamento do arquivo no Gemini: intervalo inicial, dobrado a
+# cada consulta até o teto (com um pouco de jitter), e tempo máximo total
+POLL_INITIAL_INTERVAL = 0.25  # segundos
+POLL_MAX_INTERVAL = 5.0
+POLL_TIMEOUT_SECONDS = 300
 
 
 # System Instruction da Fase 1 (Discovery) - Extraído do contexto.md
@@ -54,6 +66,21 @@ ESTRUTURA DO OBJETO:
 """
 
 
+@functools.lru_cache(maxsize=1)
+def _configure() -> None:
+    """Configura a API key do SDK uma única vez por processo."""
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_discovery_model() -> genai.GenerativeModel:
+    """Modelo da fase Discovery, construído uma vez (a system instruction tem vários KB)."""
+    return genai.GenerativeModel(
+        model_name="gemini-2.5-flash",
+        system_instruction=DISCOVERY_SYSTEM_INSTRUCTION
+    )
+
+
 def upload_audio_to_gemini(audio_path: str, display_name: str) -> str:
     """
     Faz upload de um arquivo de áudio para o Gemini File API.
@@ -70,29 +97,103 @@ def upload_audio_to_gemini(audio_path: str, display_name: str) -> str:
     Raises:
         Exception: Se o upload falhar
     """
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return upload_audios_to_gemini([{"audio_path": audio_path, "display_name": display_name}])[0]
+
+
+def upload_audios_to_gemini(
+    audios: List[Dict[str, str]],
+    on_uploaded: Optional[Callable[[int], None]] = None
+) -> List[str]:
+    """
+    Envia vários áudios e espera todos ficarem ACTIVE numa única espera
+    compartilhada: cada consulta lista os arquivos uma vez para todos os
+    pendentes, em vez de cada upload consultar get_file por conta própria.
     
-    print(f"Fazendo upload do áudio: {audio_path} (display_name: {display_name})")
+    O mesmo áudio (mesmo SHA-256, ex.: reprocessamento do livro) não é enviado
+    de novo enquanto o upload anterior ainda existe no Gemini.
     
-    # Upload do arquivo
-    audio_file = genai.upload_file(
-        path=audio_path,
-        display_name=display_name
-    )
+    Args:
+        audios: Lista de {"audio_path": caminho, "display_name": UUID do vídeo}
+        on_uploaded: Chamado com o número de áudios já enviados (progresso)
     
-    print(f"Upload iniciado. Aguardando processamento...")
+    Returns:
+        file names no Gemini File API, na mesma ordem de `audios`
     
-    # Aguardar processamento do arquivo
-    while audio_file.state.name == "PROCESSING":
-        time.sleep(2)
-        audio_file = genai.get_file(audio_file.name)
-        print(f"Status: {audio_file.state.name}")
+    Raises:
+        Exception: Se algum upload falhar
+    """
+    _configure()
     
-    if audio_file.state.name == "FAILED":
-        raise Exception(f"Falha no upload do arquivo: {audio_file.name}")
+    file_names = []
+    pending: Dict[str, str] = {}  # file name -> SHA-256, aguardando processamento
+    for done, audio in enumerate(audios, 1):
+        with open(audio["audio_path"], "rb") as f:
+            content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+        cached_name = gemini_audio_upload_cache.get(content_hash)
+        if cached_name is not None:
+            print(f"Áudio já enviado anteriormente, reutilizando: {cached_name}")
+            file_names.append(cached_name)
+        else:
+            print(f"Fazendo upload do áudio: {audio['audio_path']} (display_name: {audio['display_name']})")
+            audio_file = genai.upload_file(
+                path=audio["audio_path"],
+                display_name=audio["display_name"]
+            )
+            file_names.append(audio_file.name)
+            pending[audio_file.name] = content_hash
+        if on_uploaded:
+            on_uploaded(done)
     
-    print(f"Upload concluído. Name: {audio_file.name}")
-    return audio_file.name  # Retorna o name, não a URI
+    if pending:
+        print(f"Uploads iniciados. Aguardando processamento de {len(pending)} arquivo(s)...")
+        _wait_until_active(set(pending))
+        for file_name, content_hash in pending.items():
+            gemini_audio_upload_cache.set(content_hash, file_name)
+    
+    print(f"Uploads concluídos: {file_names}")
+    return file_names  # Retorna os names, não as URIs
+
+
+def _fetch_states(file_names: Set[str]) -> Dict[str, str]:
+    """Estado dos arquivos: get_file para um só, uma listagem para vários."""
+    if len(file_names) == 1:
+        (file_name,) = file_names
+        return {file_name: genai.get_file(file_name).state.name}
+    
+    states = {}
+    for file in genai.list_files():
+        if file.name in file_names:
+            states[file.name] = file.state.name
+            if len(states) == len(file_names):
+                break
+    return states
+
+
+def _wait_until_active(file_names: Set[str]) -> None:
+    """
+    Consulta o estado dos arquivos com backoff exponencial (0.25s -> 5s, com
+    jitter) até todos ficarem ACTIVE. Arquivos curtos são detectados em
+    frações de segundo e arquivos longos geram menos chamadas à API.
+    
+    Raises:
+        Exception: Se o processamento falhar ou exceder POLL_TIMEOUT_SECONDS
+    """
+    deadline = time.monotonic() + POLL_TIMEOUT_SECONDS
+    interval = POLL_INITIAL_INTERVAL
+    pending = set(file_names)
+    while True:
+        for file_name, state in _fetch_states(pending).items():
+            print(f"Status {file_name}: {state}")
+            if state == "FAILED":
+                raise Exception(f"Falha no upload do arquivo: {file_name}")
+            if state == "ACTIVE":
+                pending.discard(file_name)
+        if not pending:
+            return
+        if time.monotonic() > deadline:
+            raise Exception(f"Timeout aguardando processamento dos arquivos: {sorted(pending)}")
+        time.sleep(interval + random.uniform(0, 0.1))
+        interval = min(interval * 2, POLL_MAX_INTERVAL)
 
 
 def call_gemini_discovery(audio_files_info: List[Dict[str, str]]) -> Dict[str, Any]:
@@ -109,15 +210,12 @@ def call_gemini_discovery(audio_files_info: List[Dict[str, str]]) -> Dict[str, A
     Raises:
         Exception: Se a chamada ao Gemini falhar ou retornar JSON inválido
     """
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    _configure()
     
     print(f"Iniciando Discovery com {len(audio_files_info)} arquivos de áudio")
     
-    # Configurar modelo com system instruction
-    model = genai.GenerativeModel(
-        model_name="gemini-2.5-flash",
-        system_instruction=DISCOVERY_SYSTEM_INSTRUCTION
-    )
+    # Modelo com system instruction (reutilizado entre chamadas)
+    model = _get_discovery_model()
     
     # Construir prompt intercalado (Opção A - mais segura)
     # Cada ID é seguido imediatamente pela URI correspondente
@@ -157,13 +255,13 @@ def call_gemini_discovery(audio_files_info: List[Dict[str, str]]) -> Dict[str, A
         if response_text.endswith("```"):
             response_text = response_text[:-3]  # Remove ```
         
-        result = json.loads(response_text.strip())
+        result = orjson.loads(response_text.strip())
         
         print(f"JSON parseado com sucesso. {len(result.get('chapters', []))} capítulos encontrados.")
         
         return result
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"Erro ao parsear JSON: {str(e)}")
         print(f"Resposta do Gemini: {response.text}")
         raise Exception(f"Resposta do Gemini não é um JSON válido: {str(e)}")
@@ -0,0 +1,36 @@
+"""
+Static Files - StaticFiles with HTTP caching headers for served media
+"""
+import os
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+
+# Extracted images keep their placeholder-based filename (IMAGE_N.png) and are
+# overwritten when a section is regenerated, so they are not immutable: cache
+# for a bounded time and rely on ETag / Last-Modified revalidation afterwards.
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "3600"))  # seconds
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that adds a Cache-Control header to file and 304 responses.
+    Starlette already emits ETag/Last-Modified and answers conditional requests.
+    """
+
+    def __init__(self, *args, max_age: int = MEDIA_CACHE_MAX_AGE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}"
+
+    def file_response(
+        self,
+        full_path: os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["cache-control"] = self.cache_control
+        return response
@@ -0,0 +1,198 @@
+"""
+Upload Stream - Parse a multipart request body straight to disk
+
+Starlette's form parsing spools every file part to a SpooledTemporaryFile
+(in /tmp once it passes 1 MiB) before the route runs, and the route then
+copies it again to its final place. stream_upload_to_disk feeds the raw
+request stream to python-multipart and writes the single file part directly
+to its destination, so the file crosses the disk once.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import BinaryIO, Collection, Dict, List, Optional
+
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from utils.file_utils import FileTooLargeError, ensure_dir, remove_file
+
+
+# Buffered file data is written in the threadpool once it reaches this size
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB
+# Non-file form fields are small (ids, names); cap them to bound memory
+MAX_FIELDS_SIZE = 64 * 1024
+
+
+class MalformedUploadError(Exception):
+    """The request body is not a usable multipart/form-data upload."""
+
+
+class UnsupportedFileTypeError(Exception):
+    """The file part's Content-Type is not one of the allowed types."""
+
+
+@dataclass
+class StreamedUpload:
+    """Result of stream_upload_to_disk: the form fields and the written file."""
+    fields: Dict[str, str]
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size: int = 0
+
+
+@dataclass
+class _Part:
+    headers: Dict[bytes, bytes] = field(default_factory=dict)
+    name: Optional[str] = None
+    is_file: bool = False
+    data: bytearray = field(default_factory=bytearray)
+
+
+class _UploadParser:
+    """
+    python-multipart callbacks. They run synchronously inside parser.write(),
+    so file data is only queued here and written by the async caller.
+    """
+
+    def __init__(self, file_field: str, max_size: int, allowed_types: Optional[Collection[str]]):
+        self.file_field = file_field
+        self.max_size = max_size
+        self.allowed_types = allowed_types
+        # Shared prefix of the allowed types (e.g. "video/"): a cheap first
+        # rejection before the set lookup
+        self._allowed_prefix = os.path.commonprefix(list(allowed_types)) if allowed_types else ""
+        self.result = StreamedUpload(fields={})
+        self.file_started = False
+        self.file_complete = False
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self._fields_size = 0
+        self._part = _Part()
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._part.headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._part.headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise MalformedUploadError("Parte do formulário sem nome")
+        self._part.name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" not in options:
+            return
+
+        if self._part.name != self.file_field or self.file_started:
+            raise MalformedUploadError("Apenas um arquivo é aceito por requisição")
+        content_type = self._part.headers.get(b"content-type", b"").decode("latin-1").strip()
+        if self.allowed_types is not None and (
+            not content_type.startswith(self._allowed_prefix) or content_type not in self.allowed_types
+        ):
+            raise UnsupportedFileTypeError(content_type)
+
+        self._part.is_file = True
+        self.file_started = True
+        self.result.filename = options[b"filename"].decode("utf-8", "replace")
+        self.result.content_type = content_type
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part.is_file:
+            self.result.size += end - start
+            if self.result.size > self.max_size:
+                raise FileTooLargeError(f"upload exceeds {self.max_size} bytes")
+            self.pending.append(data[start:end])
+            self.pending_size += end - start
+        else:
+            self._fields_size += end - start
+            if self._fields_size > MAX_FIELDS_SIZE:
+                raise MalformedUploadError("Campos do formulário muito grandes")
+            self._part.data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self._part.is_file:
+            self.file_complete = True
+        elif self._part.name is not None:
+            self.result.fields[self._part.name] = self._part.data.decode("utf-8", "replace")
+
+    def take_pending(self) -> List[bytes]:
+        pending, self.pending, self.pending_size = self.pending, [], 0
+        return pending
+
+
+def _open_for_write(path: str) -> BinaryIO:
+    ensure_dir(os.path.dirname(path))
+    return open(path, "wb")
+
+
+async def stream_upload_to_disk(
+    request: Request,
+    file_field: str,
+    dest_path: str,
+    max_size: int,
+    allowed_types: Optional[Collection[str]] = None
+) -> StreamedUpload:
+    """
+    Read a multipart/form-data request body and write its `file_field` file
+    part to dest_path, collecting the other fields in memory.
+
+    File I/O runs in the threadpool in WRITE_BUFFER_SIZE batches. Raises
+    MalformedUploadError, UnsupportedFileTypeError (checked from the part's
+    headers, before any data is written) or FileTooLargeError (as soon as
+    more than max_size bytes arrive); dest_path is removed on any failure.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise MalformedUploadError("Requisição multipart/form-data sem boundary")
+
+    handler = _UploadParser(file_field, max_size, allowed_types)
+    parser = MultipartParser(boundary, {
+        "on_part_begin": handler.on_part_begin,
+        "on_part_data": handler.on_part_data,
+        "on_part_end": handler.on_part_end,
+        "on_header_field": handler.on_header_field,
+        "on_header_value": handler.on_header_value,
+        "on_header_end": handler.on_header_end,
+        "on_headers_finished": handler.on_headers_finished,
+    })
+
+    out: Optional[BinaryIO] = None
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise MalformedUploadError(f"Corpo multipart inválido: {e}")
+            if handler.file_started and out is None:
+                out = await run_in_threadpool(_open_for_write, dest_path)
+            if handler.pending_size >= WRITE_BUFFER_SIZE:
+                await run_in_threadpool(out.writelines, handler.take_pending())
+        parser.finalize()
+
+        if out is None:
+            raise MalformedUploadError(f"Campo obrigatório ausente: {file_field}")
+        if not handler.file_complete:
+            raise MalformedUploadError("Upload incompleto")
+        if handler.pending:
+            await run_in_threadpool(out.writelines, handler.take_pending())
+        await run_in_threadpool(out.close)
+    except BaseException:
+        if out is not None:
+            out.close()
+            await run_in_threadpool(remove_file, dest_path)
+        raise
+
+    return handler.result
@@ -0,0 +1,21 @@
+"""
+UUID Utilities - Validate UUID strings without building UUID objects
+"""
+import re
+from typing import Optional
+
+
+# Canonical 8-4-4-4-12 hex form, the only one clients send
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+
+
+def normalize_uuid_string(value: str) -> Optional[str]:
+    """
+    Return value lowercased if it is a canonical UUID string, else None.
+    
+    The string can be bound to UUID columns as-is (Postgres casts it), so
+    routes don't need to construct a uuid.UUID just to validate and query.
+    """
+    if _UUID_RE.fullmatch(value) is None:
+        return None
+    return value.lower()